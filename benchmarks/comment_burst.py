@@ -0,0 +1,124 @@
+"""Всплеск комментариев к одному посту: сразу в базу и через очередь.
+
+Несколько потоков отправляют форму комментария через WSGI-обработчик
+Django. В режиме queue параллельно работает перенос очереди, и кроме
+скорости приёма печатается, сколько ещё ждать, пока очередь опустеет.
+Каждый режим идёт в отдельном процессе на свежей копии базы.
+
+Запуск: python benchmarks/comment_burst.py --threads 16 --comments 2000
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from harness import migrate, seed, setup_django
+
+MODES = ('direct', 'queue')
+
+
+def child(args):
+    db = args.db.with_name(f'{args.db.stem}_{args.mode}.sqlite3')
+    queue_path = args.db.with_name(f'{args.db.stem}_queue.sqlite3')
+    for path in (db, queue_path):
+        for suffix in ('', '-wal', '-shm'):
+            Path(f'{path}{suffix}').unlink(missing_ok=True)
+    shutil.copy(args.db, db)
+    setup_django(db, BLOG_QUERY_SAMPLE_RATE=0, BLOG_RENDITIONS_ASYNC=False,
+                 BLOG_COMMENT_QUEUE=(str(queue_path) if args.mode == 'queue'
+                                     else None))
+    from django.contrib.auth.models import User
+    from django.db import close_old_connections
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from blog.comment_queue import get_queue
+    from blog.models import Comments, Post
+
+    setup_test_environment()
+    post = Post.objects.published().order_by('-comment_count').first()
+    users = list(User.objects.order_by('pk')[:args.threads])
+    url = f'/posts/{post.pk}/comment/'
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = Client()
+            local.client.force_login(users[threading.get_ident() % len(users)])
+        return local.client
+
+    def send(i):
+        start = time.perf_counter()
+        response = client().post(url, {'text': f'Комментарий {i}'})
+        close_old_connections()
+        return time.perf_counter() - start, response.status_code
+
+    before = Comments.objects.count()
+    queue = get_queue()
+    stop = threading.Event()
+    flusher = None
+    if queue is not None:
+        flusher = threading.Thread(target=queue.run, args=(stop, 0.05))
+        flusher.start()
+    with ThreadPoolExecutor(args.threads) as pool:
+        # Вход до замера: барьер раздаёт по одной задаче каждому потоку.
+        barrier = threading.Barrier(args.threads)
+        list(pool.map(lambda _: (client(), barrier.wait()),
+                      range(args.threads)))
+        start = time.perf_counter()
+        results = list(pool.map(send, range(args.comments)))
+        accepted = time.perf_counter() - start
+    if queue is not None:
+        while len(queue):
+            time.sleep(0.01)
+        stop.set()
+        flusher.join()
+    drained = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    failed = sum(status != 302 for _, status in results)
+    saved = Comments.objects.count() - before
+    print(f'{args.mode:<7} {args.comments / accepted:>8.1f} зап/с   '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} мс   '
+          f'в базе через {drained:>6.1f} с   сохранено {saved}, '
+          f'ошибок {failed}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=2_000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--comments', type=int, default=2_000)
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--db', type=Path, default=Path(
+        tempfile.gettempdir()) / 'bench_comments.sqlite3')
+    args = parser.parse_args()
+    if args.mode:
+        child(args)
+        return
+
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{args.db}{suffix}').unlink(missing_ok=True)
+    setup_django(args.db)
+    migrate()
+    seed(args.posts, users=max(args.threads, 50), comments=args.posts)
+    from django.db import connection
+
+    connection.close()
+    print(f'{args.comments} комментариев к одному посту, '
+          f'потоков {args.threads}:')
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, __file__, '--mode', mode,
+             '--threads', str(args.threads),
+             '--comments', str(args.comments), '--db', str(args.db)],
+            check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""EXPLAIN QUERY PLAN и время запросов ленты до и после индексов 0013.
+
+Запуск: python benchmarks/feed_indexes.py --posts 1000000
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from harness import migrate, schema_models, seed, setup_django, timed
+
+BEFORE, AFTER = '0012_post_comment_count', '0013_feed_indexes'
+
+
+def access_paths():
+    """Запросы ленты через модели схемы BEFORE.
+
+    0013 добавляет только индексы, поэтому одни и те же запросы идут на
+    обоих этапах, а полей более поздних миграций в них нет.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+
+    from blog.views import POST_CARD_FIELDS
+
+    apps = schema_models()
+    Category, Comments, Post = (apps.get_model('blog', name) for name in (
+        'Category', 'Comments', 'Post'))
+    fields = {field.name for field in Post._meta.get_fields()}
+    card_fields = [name for name in POST_CARD_FIELDS
+                   if name.split('__')[0] in fields]
+
+    def feed_queryset(queryset):
+        return queryset.select_related(
+            'author', 'category', 'location').only(
+            *card_fields).order_by('-pub_date', '-pk')
+
+    published = Post.objects.filter(pub_date__lte=timezone.now(),
+                                    is_published=True,
+                                    category__is_published=True)
+    category = Category.objects.filter(is_published=True).first()
+    author = apps.get_model(settings.AUTH_USER_MODEL).objects.first()
+    thread_post = Post.objects.order_by('-pk').first()
+    return {
+        'index': feed_queryset(published)[:10],
+        'index, page 5000': feed_queryset(published)[49990:50000],
+        'category': feed_queryset(published.filter(category=category))[:10],
+        'profile': feed_queryset(Post.objects.filter(author=author))[:10],
+        'comment thread': Comments.objects.filter(
+            post=thread_post).select_related('author')[:100],
+    }
+
+
+def explain(queryset):
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def report(stage):
+    print(f'\n=== {stage} ===')
+    for name, queryset in access_paths().items():
+        ms = timed(lambda: list(queryset.all()), repeat=5)
+        print(f'\n{name}: {ms:.2f} ms')
+        for line in explain(queryset):
+            print(f'    {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--comments', type=int, default=300_000)
+    parser.add_argument('--db', type=Path,
+                        default=Path(tempfile.gettempdir()) / 'bench.sqlite3')
+    args = parser.parse_args()
+
+    args.db.unlink(missing_ok=True)
+    setup_django(args.db)
+    migrate(BEFORE)
+    seed(args.posts, comments=args.comments)
+    report(f'без индексов ({BEFORE})')
+    migrate(AFTER)
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    report(f'с индексами ({AFTER})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Общая обвязка бенчмарков: Django на отдельной базе SQLite."""
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent / 'blogicum'
+
+
+def setup_django(db_path, **overrides):
+    """Настраивает Django на базе db_path, не трогая db.sqlite3 проекта."""
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    settings.DEBUG = False
+    # Свой кеш у каждого прогона: общий файловый кеш проекта хранил бы
+    # страницы и версии от другой базы.
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+    import django
+    django.setup()
+
+
+def migrate(target=None):
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    if target:
+        call_command('migrate', 'blog', target, verbosity=0)
+
+
+def schema_models():
+    """Реестр исторических моделей для миграций, применённых к базе.
+
+    Текущие модели знают поля последних миграций; после отката схемы
+    читать и писать нужно через этот реестр.
+    """
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    loader = MigrationExecutor(connection).loader
+    return loader.project_state(list(loader.applied_migrations)).apps
+
+
+def timed(func, repeat=20):
+    """Медиана времени выполнения func в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def seed(posts, users=1000, categories=20, locations=50, comments=0,
+         batch_size=10000):
+    """Наполняет базу синтетическими данными пакетами bulk_create."""
+    import random
+    from datetime import timedelta
+
+    from django.conf import settings
+    from django.db import connection, transaction
+    from django.db.models import Max, Min
+    from django.utils import timezone
+
+    from blog import feed
+
+    # Схема могла быть откачена к старой миграции: пишем только её поля.
+    apps = schema_models()
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Category, Comments, Location, Post = (
+        apps.get_model('blog', name)
+        for name in ('Category', 'Comments', 'Location', 'Post'))
+    rnd = random.Random(0)
+    now = timezone.now()
+
+    def batched(make, total):
+        for start in range(0, total, batch_size):
+            yield [make(i) for i in range(start, min(start + batch_size,
+                                                     total))]
+
+    with transaction.atomic():
+        for batch in batched(lambda i: User(username=f'user{i}'), users):
+            User.objects.bulk_create(batch)
+        Category.objects.bulk_create(
+            Category(title=f'Категория {i}', slug=f'category-{i}',
+                     description='', is_published=i % 10 != 0)
+            for i in range(categories))
+        Location.objects.bulk_create(
+            Location(name=f'Место {i}', is_published=i % 5 != 0)
+            for i in range(locations))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    location_ids = list(Location.objects.values_list('pk', flat=True))
+
+    def make_post(i):
+        return Post(
+            title=f'Пост {i}', text='Текст публикации ' * 20,
+            # Каждый сотый пост — отложенная публикация.
+            pub_date=(now - timedelta(minutes=i) if i % 100
+                      else now + timedelta(hours=1 + i % 720)),
+            is_published=rnd.random() > 0.05,
+            author_id=rnd.choice(user_ids),
+            category_id=rnd.choice(category_ids),
+            location_id=rnd.choice(location_ids),
+        )
+
+    for batch in batched(make_post, posts):
+        with transaction.atomic():
+            Post.objects.bulk_create(batch)
+
+    if comments:
+        first_post, last_post = Post.objects.aggregate(
+            first=Min('pk'), last=Max('pk')).values()
+
+        def make_comment(i):
+            # Треть комментариев приходится на один «вирусный» пост.
+            post_id = (last_post if i % 3 == 0
+                       else rnd.randint(first_post, last_post))
+            return Comments(text=f'Комментарий {i}', post_id=post_id,
+                            author_id=rnd.choice(user_ids))
+
+        for batch in batched(make_comment, comments):
+            with transaction.atomic():
+                Comments.objects.bulk_create(batch)
+
+    # bulk_create обходит сигналы: ленту собираем, если схема её знает.
+    if 'blog_feedentry' in connection.introspection.table_names():
+        from blog.models import Post
+
+        Post.objects.recount_comments()
+        feed.rebuild(batch_size=batch_size)
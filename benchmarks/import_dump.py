@@ -0,0 +1,74 @@
+"""loaddata против import_dump на одном и том же дампе.
+
+Сначала наполняет базу и выгружает её dumpdata в файл, затем загружает
+дамп в чистые базы обеими командами, каждой в отдельном процессе, и
+печатает время и пиковую память процесса.
+
+Запуск: python benchmarks/import_dump.py --posts 20000 --comments 100000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from harness import migrate, seed, setup_django
+
+MODELS = ['auth.user', 'blog.category', 'blog.location', 'blog.post',
+          'blog.comments']
+
+
+def child(args):
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{args.db}{suffix}').unlink(missing_ok=True)
+    setup_django(args.db, BLOG_QUERY_SAMPLE_RATE=0)
+    migrate()
+    from django.core.management import call_command
+
+    start = time.perf_counter()
+    if args.loader == 'loaddata':
+        call_command('loaddata', str(args.dump), verbosity=0)
+    else:
+        call_command('import_dump', str(args.dump), stdout=StringIO())
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'{args.loader:<12} {elapsed:>8.1f} с   пик памяти {peak:>6.0f} МиБ')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--comments', type=int, default=100_000)
+    parser.add_argument('--loader', choices=('loaddata', 'import_dump'))
+    parser.add_argument('--dump', type=Path, default=Path(
+        tempfile.gettempdir()) / 'bench_dump.json')
+    parser.add_argument('--db', type=Path, default=Path(
+        tempfile.gettempdir()) / 'bench_import.sqlite3')
+    args = parser.parse_args()
+    if args.loader:
+        child(args)
+        return
+
+    source = Path(tempfile.gettempdir()) / 'bench_import_source.sqlite3'
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{source}{suffix}').unlink(missing_ok=True)
+    setup_django(source)
+    migrate()
+    seed(args.posts, users=500, comments=args.comments)
+    from django.core.management import call_command
+
+    call_command('dumpdata', *MODELS, output=str(args.dump), verbosity=0)
+    size = args.dump.stat().st_size / 2 ** 20
+    print(f'Дамп: {size:.0f} МиБ, постов {args.posts}, '
+          f'комментариев {args.comments}')
+    for loader in ('loaddata', 'import_dump'):
+        subprocess.run(
+            [sys.executable, __file__, '--loader', loader,
+             '--dump', str(args.dump), '--db', str(args.db)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Задержки, SQL-запросы и выделения памяти по всем маршрутам blog и pages.
+
+Каждый маршрут из blog/urls.py и pages/urls.py прогоняется тестовым
+клиентом анонимно и от имени автора поста. Для каждого печатаются
+p50/p95/p99 задержки, число SQL-запросов и память, выделенная за запрос.
+Результат сравнивается с сохранённым базовым прогоном: рост числа
+запросов или p95 сверх --tolerance завершает скрипт с кодом 1.
+
+Запуск: python benchmarks/routes.py --scale small
+        python benchmarks/routes.py --scale small --save-baseline
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from harness import migrate, seed, setup_django
+
+SCALES = {
+    'small': {'users': 1_000, 'posts': 10_000, 'comments': 100_000},
+    'medium': {'users': 10_000, 'posts': 100_000, 'comments': 1_000_000},
+    'full': {'users': 10_000, 'posts': 1_000_000, 'comments': 10_000_000},
+}
+NAMESPACES = ('blog', 'pages')
+# Маршруты, которые измеряются отправкой формы, а не GET.
+POST_DATA = {
+    'blog:add_comment': {'text': 'Комментарий из бенчмарка'},
+}
+GET_DATA = {
+    'blog:search': {'q': 'Пост 12'},
+}
+BASELINE = Path(__file__).with_name('baseline_routes.json')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def route_names():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        _, sub_resolver = resolver.namespace_dict[namespace]
+        for pattern in sub_resolver.url_patterns:
+            yield f'{namespace}:{pattern.name}', pattern.pattern.converters
+
+
+def route_kwargs(converters):
+    """Аргументы маршрута: самый комментируемый видимый пост и его автор."""
+    from blog.models import Post
+
+    post = Post.objects.published().select_related(
+        'author', 'category').order_by('-comment_count').first()
+    comment = post.comments.filter(author=post.author).order_by('pk').first()
+    values = {
+        'post_id': post.pk,
+        'comment_id': comment.pk if comment else 0,
+        'category_slug': post.category.slug,
+        'username': post.author.username,
+    }
+    return post.author, {name: values[name] for name in converters}
+
+
+def fetch(client, method, url, data):
+    """Запрос вместе с телом: потоковый ответ пишется уже после view."""
+    response = getattr(client, method)(url, data)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure(client, method, url, data, requests):
+    from blog.querybudget import QueryRecorder
+
+    latencies, queries = [], []
+    status = None
+    for _ in range(requests):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = fetch(client, method, url, data)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(len(recorder))
+        status = response.status_code
+    # Память меряется отдельным проходом: tracemalloc искажает задержки.
+    tracemalloc.start()
+    fetch(client, method, url, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'status': status,
+        'p50': round(percentile(latencies, 0.50), 1),
+        'p95': round(percentile(latencies, 0.95), 1),
+        'p99': round(percentile(latencies, 0.99), 1),
+        'queries': max(queries),
+        'alloc_kib': round(peak / 1024),
+    }
+
+
+def run(requests):
+    from django.test import Client
+    from django.urls import reverse
+
+    results = {}
+    for name, converters in route_names():
+        author, kwargs = route_kwargs(converters)
+        url = reverse(name, kwargs=kwargs)
+        method = 'post' if name in POST_DATA else 'get'
+        data = POST_DATA.get(name) or GET_DATA.get(name)
+        for role in ('anon', 'author'):
+            client = Client()
+            if role == 'author':
+                client.force_login(author)
+            results[f'{name} {role}'] = measure(
+                client, method, url, data, requests)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий относительно базового прогона."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{key}: запросов {current["queries"]} > {base["queries"]}')
+        if current['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(
+                f'{key}: p95 {current["p95"]:.1f} мс > '
+                f'{base["p95"]:.1f} мс + {tolerance:.0%}')
+    return regressions
+
+
+def report(results, baseline):
+    print(f'{"маршрут":<32} {"код":>4} {"p50":>7} {"p95":>7} {"p99":>7} '
+          f'{"SQL":>4} {"КиБ":>7} {"p95 было":>9}')
+    for key, row in results.items():
+        base = baseline.get(key, {}).get('p95')
+        print(f'{key:<32} {row["status"]:>4} {row["p50"]:>7.1f} '
+              f'{row["p95"]:>7.1f} {row["p99"]:>7.1f} {row["queries"]:>4} '
+              f'{row["alloc_kib"]:>7.0f} '
+              f'{f"{base:.1f}" if base else "—":>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--requests', type=int, default=20,
+                        help='Запросов на маршрут и роль.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Допустимый рост p95 относительно базы.')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--reuse-db', action='store_true',
+                        help='Не наполнять базу заново, если файл есть.')
+    parser.add_argument('--db', type=Path)
+    args = parser.parse_args()
+
+    db = args.db or Path(
+        tempfile.gettempdir()) / f'bench_routes_{args.scale}.sqlite3'
+    fresh = not (args.reuse_db and db.exists())
+    if fresh:
+        for suffix in ('', '-wal', '-shm'):
+            Path(f'{db}{suffix}').unlink(missing_ok=True)
+    # Страничный кеш выключен: меряется путь до базы, а не попадание в кеш.
+    setup_django(db, BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_RENDITIONS_ASYNC=False,
+                 BLOG_QUERY_SAMPLE_RATE=0)
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    migrate()
+    if fresh:
+        seed(**SCALES[args.scale])
+
+    results = run(args.requests)
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    baseline = baselines.get(args.scale, {})
+    report(results, baseline)
+    if args.save_baseline:
+        baselines[args.scale] = results
+        BASELINE.write_text(
+            json.dumps(baselines, ensure_ascii=False, indent=2,
+                       sort_keys=True) + '\n')
+        print(f'Базовый прогон сохранён в {BASELINE.name}')
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f'РЕГРЕССИЯ {line}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Параллельные читатели и писатели комментариев на SQLite.
+
+Сравнивает PRAGMA по умолчанию и профиль из settings.DATABASES.
+
+Запуск: python benchmarks/sqlite_concurrency.py --readers 8 --writers 4
+"""
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from harness import migrate, seed, setup_django
+
+DEFAULT_PRAGMAS = {}
+
+
+def worker(kind, deadline, post_ids, user, results):
+    from django.db import OperationalError, connection
+    from django.test import Client
+
+    client = Client()
+    if kind == 'write':
+        client.force_login(user)
+    stats = results[threading.get_ident()] = Counter()
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            post_id = post_ids[i % len(post_ids)]
+            i += 1
+            try:
+                if kind == 'read':
+                    url = '/' if i % 2 else f'/posts/{post_id}/'
+                    response = client.get(url)
+                else:
+                    response = client.post(f'/posts/{post_id}/comment/',
+                                           {'text': f'Комментарий {i}'})
+            except OperationalError as error:
+                stats[f'{kind} error: {error}'] += 1
+                continue
+            stats[f'{kind} {response.status_code}'] += 1
+    finally:
+        connection.close()
+
+
+def run(pragmas, readers, writers, seconds):
+    from django.contrib.auth import get_user_model
+    from django.db import connections
+
+    from blog.models import Post
+
+    connections.close_all()
+    connections['default'].settings_dict['PRAGMAS'] = pragmas
+    post_ids = list(Post.objects.published().values_list('pk', flat=True)[
+        :100])
+    user = get_user_model().objects.first()
+    deadline = time.perf_counter() + seconds
+    results = {}
+    threads = [
+        threading.Thread(target=worker,
+                         args=(kind, deadline, post_ids, user, results))
+        for kind in ['read'] * readers + ['write'] * writers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = sum(results.values(), Counter())
+    for key, count in sorted(total.items()):
+        print(f'    {key}: {count} ({count / seconds:.1f}/с)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--db', type=Path, default=Path(
+        tempfile.gettempdir()) / 'bench_concurrency.sqlite3')
+    args = parser.parse_args()
+
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{args.db}{suffix}').unlink(missing_ok=True)
+    setup_django(args.db, BLOG_PAGE_CACHE_TIMEOUT=0)
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    production = dict(settings.DATABASES['default'].get('PRAGMAS', {}))
+    migrate()
+    seed(args.posts, users=100)
+
+    from django.db import connection
+    with connection.cursor() as cursor:
+        # Режим журнала хранится в файле базы: возвращаем rollback journal.
+        cursor.execute('PRAGMA journal_mode = DELETE')
+    print('PRAGMA по умолчанию:')
+    run(DEFAULT_PRAGMAS, args.readers, args.writers, args.seconds)
+    print(f'Профиль settings {production}:')
+    run(production, args.readers, args.writers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Пропускная способность страниц чтения под WSGI и ASGI.
+
+Три режима на одной базе: WSGI с пулом потоков, ASGI с синхронными
+представлениями и ASGI с blog.async_views. Приложение вызывается
+напрямую, без сетевого сервера, чтобы мерить только Django и базу.
+Каждый режим идёт в отдельном процессе: выбор представлений делается
+при импорте blog/urls.py.
+
+Запуск: python benchmarks/wsgi_vs_asgi.py --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from harness import migrate, seed, setup_django
+
+MODES = {
+    'wsgi': {'BLOG_ASYNC_VIEWS': False},
+    'asgi-sync': {'BLOG_ASYNC_VIEWS': False},
+    'asgi-async': {'BLOG_ASYNC_VIEWS': True},
+}
+
+
+def target_paths(count):
+    from blog.models import Post
+
+    posts = list(Post.objects.published().select_related(
+        'author', 'category').order_by('-pub_date')[:50])
+    paths = []
+    for i in range(count):
+        post = posts[i % len(posts)]
+        paths.append(('/', f'/posts/{post.pk}/',
+                      f'/category/{post.category.slug}/',
+                      f'/profile/{post.author.username}/')[i % 4])
+    return paths
+
+
+def run_wsgi(paths, concurrency):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def request(path):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        status = []
+        start = time.perf_counter()
+        body = b''.join(application(
+            environ, lambda code, headers: status.append(code)))
+        assert status[0].startswith('200'), (path, status, body[:200])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(request, paths))
+
+
+def run_asgi(paths, concurrency):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def request(path, limit):
+        async with limit:
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'},
+                'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 1), 'server': ('localhost', 80),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            assert messages[0]['status'] == 200, (path, messages[0])
+            return time.perf_counter() - start
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(request(path, limit)
+                                      for path in paths))
+
+    return asyncio.run(main())
+
+
+def child(args):
+    setup_django(args.db, BLOG_PAGE_CACHE_TIMEOUT=0,
+                 BLOG_QUERY_SAMPLE_RATE=0, **MODES[args.mode])
+    paths = target_paths(args.requests)
+    runner = run_wsgi if args.mode == 'wsgi' else run_asgi
+    runner(paths[:args.concurrency], args.concurrency)  # прогрев
+    start = time.perf_counter()
+    latencies = sorted(runner(paths, args.concurrency))
+    elapsed = time.perf_counter() - start
+    print(f'{args.mode:<11} {len(paths) / elapsed:>8.1f} зап/с   '
+          f'p50 {latencies[len(latencies) // 2] * 1000:>7.1f} мс   '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--comments', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--db', type=Path, default=Path(
+        tempfile.gettempdir()) / 'bench_wsgi_asgi.sqlite3')
+    args = parser.parse_args()
+    if args.mode:
+        child(args)
+        return
+
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{args.db}{suffix}').unlink(missing_ok=True)
+    setup_django(args.db)
+    migrate()
+    seed(args.posts, users=200, comments=args.comments)
+    print(f'{args.requests} запросов, одновременно {args.concurrency}:')
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, __file__, '--mode', mode,
+             '--requests', str(args.requests),
+             '--concurrency', str(args.concurrency), '--db', str(args.db)],
+            check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('is_published',)
     list_display_links = ('title',)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Category, CategoryAdmin)
@@ -0,0 +1,134 @@
+"""JSON API только для чтения и потоковая выгрузка публикаций в NDJSON."""
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .models import Category, Comments, Post
+from .paginators import CursorPaginator
+
+PAGE_SIZE = 50
+COMMENTS_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+
+
+def post_to_dict(post):
+    location = post.location
+    return {
+        'id': post.pk,
+        'title': post.title,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'category': post.category.slug,
+        'location': (location.name if location and location.is_published
+                     else None),
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def category_to_dict(category):
+    return {
+        'slug': category.slug,
+        'title': category.title,
+        'description': category.description,
+    }
+
+
+def comment_to_dict(comment):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created_at': comment.created_at,
+    }
+
+
+def published_posts():
+    return Post.objects.published().select_related(
+        'author', 'category', 'location')
+
+
+def export_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки NDJSON; в памяти не больше chunk_size постов за раз."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for post in queryset.iterator(chunk_size=chunk_size):
+        yield encoder.encode(post_to_dict(post)) + '\n'
+
+
+def api_response(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+def post_list(request):
+    """Опубликованные посты от новых к старым, курсор в ?after=."""
+    posts = published_posts().order_by('-pub_date', '-pk')
+    if 'category' in request.GET:
+        posts = posts.filter(category__slug=request.GET['category'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    try:
+        page = CursorPaginator(posts, PAGE_SIZE).page(
+            after=request.GET.get('after'))
+    except InvalidPage as e:
+        raise Http404(str(e))
+    return api_response({
+        'results': [post_to_dict(post) for post in page],
+        'next': page.next_cursor,
+    })
+
+
+@require_GET
+def post_detail(request, post_id):
+    return api_response(post_to_dict(
+        get_object_or_404(published_posts(), pk=post_id)))
+
+
+@require_GET
+def comment_list(request, post_id):
+    """Комментарии видимого поста по возрастанию id, курсор в ?after=."""
+    post = get_object_or_404(Post.objects.published(), pk=post_id)
+    comments = Comments.objects.filter(post=post).select_related(
+        'author').order_by('pk')
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        raise Http404('Неверный курсор страницы')
+    page = list(comments.filter(pk__gt=after)[:COMMENTS_PAGE_SIZE + 1])
+    has_more = len(page) > COMMENTS_PAGE_SIZE
+    page = page[:COMMENTS_PAGE_SIZE]
+    return api_response({
+        'results': [comment_to_dict(comment) for comment in page],
+        'next': page[-1].pk if has_more else None,
+    })
+
+
+@require_GET
+def category_list(request):
+    categories = Category.objects.filter(is_published=True).order_by('title')
+    return api_response({
+        'results': [category_to_dict(category) for category in categories],
+    })
+
+
+@require_GET
+def export_posts(request):
+    """Весь опубликованный корпус одним потоком NDJSON."""
+    # Поток читается после выхода из view, когда ReplicaMiddleware уже
+    # вернул чтения в основную базу: реплика закрепляется за запросом здесь.
+    posts = published_posts().using(router.db_for_read(Post))
+    response = StreamingHttpResponse(
+        export_lines(posts.order_by('pk')),
+        content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="posts.ndjson"'
+    return response
+
+
+for view in (post_list, post_detail, comment_list, category_list,
+             export_posts):
+    view.use_replica = True
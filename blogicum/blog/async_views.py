@@ -0,0 +1,186 @@
+"""Асинхронные страницы чтения для запуска под ASGI.
+
+Повторяют IndexView, CategoryPostsView, ProfileView и PostDetailView, но
+не занимают поток на весь запрос: независимые запросы к базе (страница,
+COUNT, сам объект, комментарии) идут параллельно в пуле потоков, рендер
+шаблона тоже вынесен из цикла событий. Включаются BLOG_ASYNC_VIEWS.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, render
+
+from .cache import attach_card_versions, page_cache_key
+from .forms import CommentsForm
+from .models import Category, FeedEntry, Post
+from .paginators import CursorPaginator
+from .routers import read_from_primary, reading_replica
+from .utils import feed_cutoff
+from .views import FeedMixin, comment_page, feed_queryset
+
+
+def in_thread(func, *args, **kwargs):
+    """Вызов синхронного кода вне цикла событий.
+
+    thread_sensitive=False позволяет нескольким вызовам идти одновременно:
+    у каждого потока пула своё подключение к базе. Сигналы начала и конца
+    запроса в эти потоки не приходят, поэтому устаревшие и сломанные
+    подключения закрываются здесь, до и после вызова, как по CONN_MAX_AGE.
+    """
+    def call():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+async def resolve_user(request):
+    # request.user ленивый и читает сессию из базы.
+    await in_thread(lambda: request.user.is_authenticated)
+    return request.user
+
+
+async def paginate(request, queryset, per_page=FeedMixin.paginate_by):
+    """Страница ленты: строки и COUNT(*) запрашиваются одновременно."""
+    if settings.BLOG_CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, per_page)
+        try:
+            return await in_thread(paginator.page,
+                                   after=request.GET.get('after'),
+                                   before=request.GET.get('before'))
+        except InvalidPage as e:
+            raise Http404(str(e))
+    paginator = Paginator(queryset, per_page)
+    number = request.GET.get('page') or 1
+    if number == 'last':
+        paginator.count = await in_thread(queryset.count)
+        number = paginator.num_pages
+    try:
+        number = int(number)
+    except ValueError:
+        raise Http404('Номер страницы должен быть числом')
+    offset = max(number - 1, 0) * per_page
+    fetch_rows = in_thread(lambda: list(queryset[offset:offset + per_page]))
+    if 'count' in paginator.__dict__:
+        rows = await fetch_rows
+    else:
+        paginator.count, rows = await asyncio.gather(
+            in_thread(queryset.count), fetch_rows)
+    try:
+        number = paginator.validate_number(number)
+    except InvalidPage as e:
+        raise Http404(str(e))
+    return Page(rows, number, paginator)
+
+
+def page_context(page, **extra):
+    return {
+        'paginator': page.paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': page.object_list,
+        **extra,
+    }
+
+
+def render_feed(request, template_name, context):
+    attach_card_versions(context['page_obj'])
+    return render(request, template_name, context)
+
+
+async def cached_for_anonymous(request, scopes, build):
+    """Как AnonymousPageCacheMixin: готовая страница для анонимов."""
+    timeout = settings.BLOG_PAGE_CACHE_TIMEOUT
+    if not timeout or request.user.is_authenticated:
+        return await build()
+    key = await in_thread(page_cache_key, request, scopes)
+    content = await in_thread(cache.get, key)
+    if content is not None:
+        return HttpResponse(content)
+    # Промах рендерится из основной базы: страница ляжет в кеш надолго.
+    read_from_primary()
+    response = await build()
+    if response.status_code == 200 and not reading_replica():
+        await in_thread(cache.set, key, response.content, timeout)
+    return response
+
+
+async def index(request):
+    await resolve_user(request)
+
+    async def build():
+        page = await paginate(request, FeedEntry.objects.filter(
+            pub_date__lte=feed_cutoff()).order_by('-pub_date', '-post'))
+        page.object_list = [entry.as_post() for entry in page]
+        return await in_thread(render_feed, request, 'blog/index.html',
+                               page_context(page))
+
+    return await cached_for_anonymous(request, [('feed', 'all')], build)
+
+
+async def category_posts(request, category_slug):
+    await resolve_user(request)
+
+    async def build():
+        category, page = await asyncio.gather(
+            in_thread(get_object_or_404,
+                      Category.objects.filter(is_published=True),
+                      slug=category_slug),
+            paginate(request, feed_queryset(Post.objects.published().filter(
+                category__slug=category_slug))))
+        return await in_thread(render_feed, request, 'blog/category.html',
+                               page_context(page, category=category))
+
+    return await cached_for_anonymous(
+        request, [('category', category_slug)], build)
+
+
+async def profile(request, username):
+    user = await resolve_user(request)
+
+    async def build():
+        posts = Post.objects.filter(author__username=username)
+        if user.username != username:
+            posts = posts.published()
+        try:
+            owner, page = await asyncio.gather(
+                in_thread(User.objects.get, username=username),
+                paginate(request, feed_queryset(posts)))
+        except User.DoesNotExist:
+            raise Http404('Пользователь не найден')
+        return await in_thread(render_feed, request, 'blog/profile.html',
+                               page_context(page, profile=owner))
+
+    return await cached_for_anonymous(
+        request, [('author', username)], build)
+
+
+async def post_detail(request, post_id):
+    user = await resolve_user(request)
+    post, comments = await asyncio.gather(
+        in_thread(get_object_or_404, Post.objects.select_related(
+            'author', 'category', 'location'), pk=post_id),
+        in_thread(comment_page, post_id,
+                  request.GET.get('comments_after')))
+    if post.author_id != user.pk and not post.is_visible():
+        raise Http404
+    return await in_thread(render, request, 'blog/detail.html', {
+        'object': post,
+        'post': post,
+        'form': CommentsForm(),
+        'comments': comments,
+        'comment_count': post.comment_count,
+    })
+
+
+for view in (index, category_posts, profile, post_detail):
+    view.use_replica = True
@@ -0,0 +1,109 @@
+"""Пользователь запроса без обращения к auth_user на каждой странице.
+
+Короткая запись о пользователе (id, username, флаги и хеш для проверки
+сессии) хранится в общем кеше BLOG_USER_CACHE_TIMEOUT секунд и ещё
+LOCAL_TTL секунд в памяти процесса. Из записи собирается экземпляр User
+с отложенными остальными полями: обращение к ним, например в форме
+профиля, дочитает их из базы. Запись помечена версией ('user', id) из
+blog.cache, которую меняет каждое сохранение пользователя, в том числе
+смена пароля и блокировка. Версия сверяется с общим кешем на каждом
+запросе, и копия в памяти процесса тоже: другие процессы видят смену
+сразу, без запроса к базе.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.core.cache import cache
+from django.db import router
+from django.utils.crypto import constant_time_compare
+
+from .cache import STAMP_KEY, get_stamps
+
+User = get_user_model()
+
+USER_KEY = 'blog:user:{}'
+LOCAL_TTL = 5
+LOCAL_MAX_SIZE = 10_000
+RECORD_FIELDS = ('id', 'username', 'is_staff', 'is_superuser', 'is_active')
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def user_record(user):
+    record = {name: getattr(user, name) for name in RECORD_FIELDS}
+    record['session_hash'] = user.get_session_auth_hash()
+    return record
+
+
+def user_from_record(record):
+    names = [field.attname for field in User._meta.concrete_fields
+             if field.attname in RECORD_FIELDS]
+    return User.from_db(router.db_for_read(User), names,
+                        [record[name] for name in names])
+
+
+def cached_record(user_id):
+    stamp_key = STAMP_KEY.format('user', user_id)
+    now = time.monotonic()
+    with _local_lock:
+        expires, record = _local.get(user_id, (0, None))
+    if expires > now and record['stamp'] == cache.get(stamp_key):
+        return record
+    found = cache.get_many([stamp_key, USER_KEY.format(user_id)])
+    record = found.get(USER_KEY.format(user_id))
+    if record is None or record['stamp'] != found.get(stamp_key):
+        return None
+    remember_locally(user_id, record)
+    return record
+
+
+def remember_locally(user_id, record):
+    with _local_lock:
+        if len(_local) >= LOCAL_MAX_SIZE:
+            _local.clear()
+        _local[user_id] = (time.monotonic() + LOCAL_TTL, record)
+
+
+def forget_locally(user_id):
+    with _local_lock:
+        _local.pop(user_id, None)
+
+
+def clear_local():
+    with _local_lock:
+        _local.clear()
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но из кеша, если запись есть.
+
+    Промах, чужой бэкенд или несовпавший хеш сессии отдаются Django:
+    он же выйдет из сессии, если пароль сменился.
+    """
+    session = request.session
+    try:
+        user_id = User._meta.pk.to_python(session[SESSION_KEY])
+        backend = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+    record = (cached_record(user_id)
+              if backend in settings.AUTHENTICATION_BACKENDS else None)
+    if record is not None and constant_time_compare(
+            session.get(HASH_SESSION_KEY, ''), record['session_hash']):
+        return user_from_record(record)
+    # Версия берётся до чтения из базы: если пользователя сохранят
+    # между чтением и записью в кеш, запись уже не совпадёт с версией.
+    stamp = get_stamps([('user', user_id)])[('user', user_id)]
+    user = auth.get_user(request)
+    if user.is_authenticated and user.pk == user_id:
+        record = user_record(user)
+        record['stamp'] = stamp
+        cache.set(USER_KEY.format(user_id), record,
+                  settings.BLOG_USER_CACHE_TIMEOUT)
+        remember_locally(user_id, record)
+    return user
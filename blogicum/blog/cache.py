@@ -0,0 +1,114 @@
+import time
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from .routers import reading_replica
+
+STAMP_KEY = 'blog:stamp:{}:{}'
+
+
+def _new_stamp():
+    return time.time_ns()
+
+
+def bump_stamp(label, pk):
+    """Меняет версию объекта сразу и ещё раз после коммита транзакции.
+
+    Повторная смена закрывает гонку, когда читатель успел закешировать
+    фрагмент по новой версии, но со старыми данными из базы.
+    """
+    if pk is None:
+        return
+    key = STAMP_KEY.format(label, pk)
+    cache.set(key, _new_stamp(), None)
+    transaction.on_commit(lambda: cache.set(key, _new_stamp(), None))
+
+
+def get_stamps(pairs):
+    keys = {pair: STAMP_KEY.format(*pair) for pair in pairs if pair[1]}
+    found = cache.get_many(keys.values())
+    missing = {key: _new_stamp() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {pair: found[key] for pair, key in keys.items()}
+
+
+def attach_card_versions(page):
+    """Проставляет post.card_version для ключа кеша карточки.
+
+    При чтении из реплики готовые карточки берутся из кеша в
+    post.card_html, а недостающие рендерятся без записи в кеш.
+    """
+    posts = list(page)
+
+    def related(post):
+        return (('post', post.pk),
+                ('user', post.author_id),
+                ('category', post.category_id),
+                ('location', post.location_id))
+
+    stamps = get_stamps({pair for post in posts for pair in related(post)})
+    for post in posts:
+        post.card_version = '-'.join(
+            str(stamps.get(pair, 0)) for pair in related(post))
+    if not reading_replica():
+        return
+    keys = [make_template_fragment_key(
+        'post_card', [post.pk, post.card_version]) for post in posts]
+    found = cache.get_many(keys)
+    for post, key in zip(posts, keys):
+        post.card_version = None
+        if key in found:
+            post.card_html = mark_safe(found[key])
+
+
+NEXT_PUB_DATE_KEY = 'blog:next_pub_date'
+
+
+def scope_generation(scopes):
+    """Поколение содержимого для набора областей.
+
+    scopes — пары вида ('category', slug); поколение 'shared' добавляется
+    всегда, его меняют правки, видимые на всех лентах сразу.
+    """
+    check_scheduled_posts()
+    pairs = [('shared', 'all'), *scopes]
+    stamps = get_stamps(pairs)
+    return '-'.join(str(stamps[pair]) for pair in pairs)
+
+
+def page_cache_key(request, scopes):
+    """Ключ страницы: путь с параметрами и поколения её областей."""
+    return f'blog:page:{request.get_full_path()}:{scope_generation(scopes)}'
+
+
+def bump_feed_generations(category_slugs=(), usernames=()):
+    bump_stamp('feed', 'all')
+    for slug in category_slugs:
+        bump_stamp('category', slug)
+    for username in usernames:
+        bump_stamp('author', username)
+    cache.delete(NEXT_PUB_DATE_KEY)
+
+
+def check_scheduled_posts():
+    """Сбрасывает все страницы, когда наступает дата отложенного поста."""
+    from .models import Post
+    from .utils import feed_cutoff
+
+    cutoff = feed_cutoff()
+    next_pub_date = cache.get(NEXT_PUB_DATE_KEY)
+    if next_pub_date is not None and (
+            not next_pub_date or cutoff.timestamp() < next_pub_date):
+        return
+    if next_pub_date:
+        bump_stamp('shared', 'all')
+    upcoming = Post.objects.filter(
+        is_published=True, pub_date__gt=cutoff).order_by(
+        'pub_date').values_list('pub_date', flat=True).first()
+    cache.set(NEXT_PUB_DATE_KEY, upcoming.timestamp() if upcoming else 0,
+              None)
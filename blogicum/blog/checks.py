@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кеши, которые видит только один процесс.
+LOCAL_CACHES = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+})
+CACHED_SESSION_ENGINES = frozenset({
+    'blog.sessions',
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+})
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии карточек, поколения страниц и ETag живут в кеше.
+
+    С кешем процесса правка сбрасывает их только в этом процессе.
+    """
+    if settings.DEBUG or settings.CACHES['default'][
+            'BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Error(
+        'Кеш по умолчанию локален для процесса: при нескольких процессах '
+        'правки не сбросят закешированные страницы в остальных.',
+        hint='Укажите в CACHES общий кеш: Redis, Memcached, базу данных '
+             'или файлы на общем диске.',
+        id='blog.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """Сессия в кеше процесса переживает выход в остальных процессах."""
+    if (settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES
+            or settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES):
+        return []
+    return [Error(
+        'Сессии читаются из кеша, локального для процесса: выход из '
+        'сессии не отзовёт её в других процессах.',
+        hint="Задайте общий кеш в CACHES или BLOG_SESSION_MODE = 'db'.",
+        id='blog.E002',
+    )]
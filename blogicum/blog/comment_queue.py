@@ -0,0 +1,184 @@
+"""Отложенная запись комментариев при всплесках нагрузки.
+
+При BLOG_COMMENT_QUEUE add_comment не пишет в основную базу, а
+дописывает проверенный комментарий в отдельную базу SQLite: блокировка
+записи основной базы не берётся на каждый запрос. Команда flush_comments
+переносит очередь пачками: одна транзакция на пачку вместе со счётчиками.
+"""
+import logging
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_feed_generations, bump_stamp
+from .importer import insert_raw
+from .models import Comments, FeedEntry, Post
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS comment_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+)
+'''
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class CommentQueue:
+    """Очередь в отдельном файле SQLite, своё подключение у каждого потока.
+
+    Запись из очереди удаляется только после коммита пачки в основную
+    базу. Если процесс упал между коммитом и удалением, при повторном
+    переносе уже сохранённые комментарии узнаются по (пост, автор, время).
+    Переносить очередь должен один процесс.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM comment_queue').fetchone()[0]
+
+    def append(self, post_id, author_id, text, created_at=None):
+        created_at = created_at or timezone.now()
+        self.connection.execute(
+            'INSERT INTO comment_queue (post_id, author_id, text, created_at) '
+            'VALUES (?, ?, ?, ?)',
+            (post_id, author_id, text, created_at.isoformat()))
+
+    def take(self, limit):
+        """Первые limit записей: [(id, Comments), ...] без сохранения."""
+        rows = self.connection.execute(
+            'SELECT id, post_id, author_id, text, created_at '
+            'FROM comment_queue ORDER BY id LIMIT ?', (limit,)).fetchall()
+        return [
+            (row_id, Comments(post_id=post_id, author_id=author_id,
+                              text=text,
+                              created_at=datetime.fromisoformat(created_at)))
+            for row_id, post_id, author_id, text, created_at in rows
+        ]
+
+    def ack(self, last_id):
+        self.connection.execute(
+            'DELETE FROM comment_queue WHERE id <= ?', (last_id,))
+
+    def flush(self, batch_size=BATCH_SIZE):
+        """Переносит одну пачку в blog.Comments, возвращает её размер."""
+        batch = self.take(batch_size)
+        if not batch:
+            return 0
+        # Проверки читают вне транзакции: в SQLite транзакция, начатая
+        # чтением, не может перейти к записи, если кто-то писал между ними.
+        comments = self._fresh([comment for _, comment in batch])
+        if comments:
+            with transaction.atomic():
+                insert_raw(Comments, comments)
+                update_counters(Counter(
+                    comment.post_id for comment in comments))
+        self.ack(batch[-1][0])
+        return len(batch)
+
+    def flush_all(self, batch_size=BATCH_SIZE):
+        total = 0
+        while True:
+            flushed = self.flush(batch_size)
+            if not flushed:
+                return total
+            total += flushed
+
+    def _fresh(self, comments):
+        """Без уже перенесённых и без ссылок на удалённые посты и авторов."""
+        posts = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}).values_list(
+            'pk', flat=True))
+        authors = set(User.objects.filter(
+            pk__in={comment.author_id for comment in comments}).values_list(
+            'pk', flat=True))
+        saved = set(Comments.objects.filter(
+            post__in=posts,
+            created_at__in=[comment.created_at for comment in comments],
+        ).values_list('post_id', 'author_id', 'created_at'))
+        return [
+            comment for comment in comments
+            if comment.post_id in posts and comment.author_id in authors
+            and (comment.post_id, comment.author_id,
+                 comment.created_at) not in saved
+        ]
+
+    def run(self, stop_event=None, poll_interval=1, batch_size=BATCH_SIZE):
+        """Цикл переноса: пока очередь не пуста — без пауз."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                if self.flush(batch_size):
+                    continue
+            except Exception:
+                logger.exception('Сбой переноса очереди комментариев')
+            stop_event.wait(poll_interval)
+
+
+def update_counters(counts):
+    """То, что для одиночного комментария делают сигналы post_save.
+
+    Посты с одинаковым приростом обновляются одним UPDATE.
+    """
+    by_increment = defaultdict(list)
+    for post_id, added in counts.items():
+        by_increment[added].append(post_id)
+    now = timezone.now()
+    for added, post_ids in by_increment.items():
+        Post.objects.filter(pk__in=post_ids).update(
+            comment_count=F('comment_count') + added, updated_at=now)
+        FeedEntry.objects.filter(post_id__in=post_ids).update(
+            comment_count=F('comment_count') + added)
+    pages = list(Post.objects.filter(pk__in=counts).values_list(
+        'category__slug', 'author__username'))
+    for post_id in counts:
+        bump_stamp('post', post_id)
+    if pages:
+        slugs, usernames = zip(*pages)
+        bump_feed_generations({slug for slug in slugs if slug},
+                              set(usernames))
+
+
+def get_queue():
+    """Очередь из BLOG_COMMENT_QUEUE или None, если она выключена."""
+    path = settings.BLOG_COMMENT_QUEUE
+    if not path:
+        return None
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = CommentQueue(path)
+        return _queues[path]
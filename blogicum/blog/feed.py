@@ -0,0 +1,64 @@
+"""Инкрементальное обновление материализованной ленты FeedEntry."""
+from django.db import transaction
+
+from .models import FeedEntry, Post
+
+BATCH_SIZE = 1000
+
+
+def visible_posts():
+    # Дата публикации не проверяется: отложенные посты лежат в ленте
+    # заранее и становятся видны по pub_date при чтении.
+    return Post.objects.filter(
+        is_published=True, category__is_published=True).select_related(
+        'author', 'category', 'location')
+
+
+def sync_post(post_id):
+    post = visible_posts().filter(pk=post_id).first()
+    if post is None:
+        FeedEntry.objects.filter(post_id=post_id).delete()
+    else:
+        FeedEntry.objects.update_or_create(
+            post_id=post_id, defaults=FeedEntry.fields_from_post(post))
+
+
+def rebuild(posts=None, batch_size=BATCH_SIZE):
+    """Пересоздаёт строки ленты для posts (по умолчанию — для всех)."""
+    if posts is None:
+        stale, posts = FeedEntry.objects.all(), visible_posts()
+    else:
+        stale = FeedEntry.objects.filter(post__in=posts)
+        posts = visible_posts().filter(pk__in=posts.values('pk'))
+    created = 0
+    with transaction.atomic():
+        stale.delete()
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            batch.append(FeedEntry(post_id=post.pk,
+                                   **FeedEntry.fields_from_post(post)))
+            if len(batch) >= batch_size:
+                created += len(FeedEntry.objects.bulk_create(batch))
+                batch = []
+        created += len(FeedEntry.objects.bulk_create(batch))
+    return created
+
+
+def sync_category(category, was_published=None):
+    """Показ или скрытие категории пересобирает её строки, правка — UPDATE."""
+    if category.is_published != was_published:
+        rebuild(Post.objects.filter(category_id=category.pk))
+    else:
+        FeedEntry.objects.filter(category_id=category.pk).update(
+            category_slug=category.slug, category_title=category.title)
+
+
+def sync_location(location):
+    FeedEntry.objects.filter(location_id=location.pk).update(
+        location_name=location.name,
+        location_is_published=location.is_published)
+
+
+def sync_author(user):
+    FeedEntry.objects.filter(author_id=user.pk).exclude(
+        author_username=user.username).update(author_username=user.username)
@@ -0,0 +1,336 @@
+"""Потоковая загрузка дампов dumpdata для пользователей и моделей блога.
+
+В отличие от loaddata, файл читается по частям, объекты сохраняются
+пачками bulk-вставок без сигналов, а индексы из Meta.indexes и триггер
+полнотекстового поиска снимаются на время загрузки. Память не зависит от
+размера дампа: первичные ключи сдвигаются на максимальный ключ таблицы,
+так что ссылка пересчитывается сложением, без словаря на каждый объект.
+Диапазон сдвинутых ключей занимается до первой вставки, поэтому сайт
+может работать во время загрузки.
+"""
+import json
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.serializers import base, python
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Q
+
+from . import feed
+from .cache import bump_feed_generations, bump_stamp
+from .models import Category, Comments, Location, Post
+
+User = get_user_model()
+
+# Родители раньше детей: пачка модели сохраняется после пачек родителей.
+MODELS = {
+    'auth.user': User,
+    'blog.category': Category,
+    'blog.location': Location,
+    'blog.post': Post,
+    'blog.comments': Comments,
+}
+# Уникальные поля: объект, уже существующий в базе, не создаётся заново,
+# а ссылки на него из дампа ведут на имеющуюся строку.
+NATURAL_KEYS = {
+    'auth.user': 'username',
+    'blog.category': 'slug',
+}
+BATCH_SIZE = 5000
+# Отрезков ключей в одном DELETE при откате загрузки.
+DISCARD_RANGES = 200
+READ_SIZE = 1 << 16
+SEPARATORS = frozenset(' \t\r\n[],')
+# Без них вставка не пишет в индекс поиска, а откат неудачной загрузки
+# не удаляет из него строк, которых там не было.
+FTS_TRIGGERS = ('blog_post_fts_insert', 'blog_post_fts_delete')
+
+
+class DumpImportError(base.DeserializationError):
+    """Дамп нельзя загрузить: битый JSON, дубликат или неизвестная ссылка."""
+
+
+def iter_objects(stream, read_size=READ_SIZE):
+    """Объекты из JSON-массива dumpdata или из JSON Lines, по одному.
+
+    В памяти держится только текущий кусок файла и один объект.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # Объект оборвался на границе куска или буфер кончился.
+            chunk = stream.read(read_size)
+            if not chunk:
+                if position == len(buffer):
+                    return
+                raise DumpImportError(f'Битый JSON в дампе: {e}')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield obj
+
+
+class KeyShift:
+    """Новый ключ = ключ из дампа + сдвиг из reserve_keys().
+
+    Для пустой таблицы ключи сохраняются, как у loaddata.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.reused = {}
+        # Отрезки [первый, последний] ключей, вставленных загрузкой. Строки,
+        # которые сайт создал за время загрузки, в них не попадают.
+        self.inserted = []
+
+    def __call__(self, pk):
+        if pk is None:
+            return None
+        return self.reused.get(pk, pk + self.offset)
+
+    def record(self, objs):
+        for pk in sorted(obj.pk for obj in objs):
+            if self.inserted and self.inserted[-1][1] + 1 == pk:
+                self.inserted[-1][1] = pk
+            else:
+                self.inserted.append([pk, pk])
+
+
+def reserve_keys(model, count):
+    """Занимает ключи offset + 1 … offset + count, возвращает offset.
+
+    На SQLite счётчик AUTOINCREMENT в sqlite_sequence переносится за
+    последний занятый ключ: строки, которые сайт создаёт во время
+    загрузки, получают ключи дальше и с загрузкой не пересекаются. На
+    других СУБД сдвиг — максимальный ключ таблицы, и загружать дамп
+    нужно при остановленном сайте.
+    """
+    if connection.vendor != 'sqlite':
+        return model._default_manager.aggregate(top=Max('pk'))['top'] or 0
+    table = model._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Запись сразу берёт блокировку: между чтением максимального
+        # ключа и сдвигом счётчика никто не вставит строку.
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq WHERE name = %s', [table])
+        offset = model._default_manager.aggregate(
+            top=Max('pk'))['top'] or 0
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s',
+            [offset + count, table])
+        if not cursor.rowcount:
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, offset + count])
+    return offset
+
+
+def spooled(stream):
+    """Копия несекущегося потока (stdin) во временном файле."""
+    copy = tempfile.TemporaryFile('w+', encoding='utf-8')
+    shutil.copyfileobj(stream, copy)
+    copy.seek(0)
+    return copy
+
+
+def insert_raw(model, objs):
+    """INSERT без pre_save: даты auto_now_add берутся из дампа.
+
+    bulk_create перезаписал бы created_at текущим временем, поэтому
+    используется та же «сырая» вставка, что и при loaddata.
+    """
+    fields = model._meta.local_concrete_fields
+    for obj in objs:
+        for field in fields:
+            if getattr(obj, field.attname) is None and (
+                    getattr(field, 'auto_now', False)
+                    or getattr(field, 'auto_now_add', False)):
+                field.pre_save(obj, add=True)
+    size = connection.ops.bulk_batch_size(fields, objs) or len(objs)
+    for start in range(0, len(objs), size):
+        model._base_manager._insert(
+            objs[start:start + size], fields=fields, raw=True)
+
+
+@contextmanager
+def deferred_indexes(models):
+    """Снимает Meta.indexes и FTS-триггеры, затем строит их заново."""
+    indexes = [(model, index) for model in models
+               for index in model._meta.indexes]
+    triggers = []
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                "AND name IN (%s, %s)", FTS_TRIGGERS)
+            triggers = cursor.fetchall()
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+        for name, _ in triggers:
+            editor.execute(f'DROP TRIGGER {name}')
+    try:
+        yield bool(triggers)
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+            for _, sql in triggers:
+                editor.execute(sql)
+
+
+class DumpImporter:
+
+    def __init__(self, batch_size=BATCH_SIZE, defer_indexes=True):
+        self.batch_size = batch_size
+        self.defer_indexes = defer_indexes
+        self.stats = Counter()
+
+    def run(self, stream):
+        if not stream.seekable():
+            with spooled(stream) as copy:
+                return self.run(copy)
+        self.keys = {label: KeyShift() for label in MODELS}
+        self.existing = {
+            label: dict(MODELS[label]._default_manager.values_list(
+                field, 'pk'))
+            for label, field in NATURAL_KEYS.items()
+        }
+        # Первый проход: наибольшие ключи дампа, чтобы занять место под
+        # загрузку, и совпадения по естественному ключу — dumpdata пишет
+        # auth.user после blog.post, а знать их нужно до пачки постов.
+        top = Counter()
+        for obj in iter_objects(stream):
+            label = obj.get('model', '').lower()
+            if label in MODELS and obj.get('pk') is not None:
+                top[label] = max(top[label], int(obj['pk']))
+            self.match_existing(obj)
+        stream.seek(0)
+        for label, model in MODELS.items():
+            self.keys[label].offset = reserve_keys(model, top[label])
+        self.batches = {label: [] for label in MODELS}
+        deferred = (deferred_indexes([Post, Comments]) if self.defer_indexes
+                    else nullcontext(False))
+        # Проверка внешних ключей откладывается до конца загрузки, как в
+        # loaddata: в дампе дети нередко идут раньше родителей. Отключать
+        # её нужно после снятия индексов: schema_editor включает её обратно.
+        with deferred as fts_deferred:
+            with connection.constraint_checks_disabled():
+                self.load(stream)
+            self.finish(fts_deferred)
+        return self.stats
+
+    def load(self, stream):
+        try:
+            for obj in iter_objects(stream):
+                self.add(obj)
+            for label in MODELS:
+                self.flush(label)
+            connection.check_constraints(table_names=[
+                model._meta.db_table for model in MODELS.values()])
+        except IntegrityError as e:
+            self.discard()
+            raise DumpImportError(
+                f'Дамп ссылается на неизвестные объекты: {e}')
+        except DumpImportError:
+            self.discard()
+            raise
+
+    def match_existing(self, obj):
+        """Запоминает объект дампа, который уже есть в базе."""
+        label = obj.get('model', '').lower()
+        if label not in NATURAL_KEYS:
+            return False
+        existing = self.existing[label].get(
+            obj['fields'].get(NATURAL_KEYS[label]))
+        if existing is None:
+            return False
+        self.keys[label].reused[obj['pk']] = existing
+        return True
+
+    def add(self, obj):
+        label = obj.get('model', '').lower()
+        if label not in MODELS:
+            self.stats['пропущено'] += 1
+            return
+        if self.match_existing(obj):
+            self.stats[f'{label} (уже были)'] += 1
+            return
+        fields = dict(obj['fields'])
+        model = MODELS[label]
+        for field in model._meta.many_to_many:
+            # Группы и права пользователей не переносятся.
+            fields.pop(field.name, None)
+        for field in model._meta.concrete_fields:
+            target = field.related_model
+            if field.is_relation and field.name in fields:
+                target_label = target._meta.label_lower
+                fields[field.name] = self.keys[target_label](
+                    fields[field.name])
+        deserialized = next(python.Deserializer(
+            [{'model': label, 'pk': self.keys[label](obj['pk']),
+              'fields': fields}], ignorenonexistent=True))
+        batch = self.batches[label]
+        batch.append(deserialized.object)
+        if len(batch) >= self.batch_size:
+            self.flush(label)
+
+    def flush(self, label):
+        # Сначала родители, чтобы отложенная проверка FK при коммите
+        # пачки видела их строки.
+        for parent in MODELS:
+            if parent == label:
+                break
+            if self.batches[parent]:
+                self.flush(parent)
+        batch = self.batches[label]
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                insert_raw(MODELS[label], batch)
+        except IntegrityError as e:
+            raise DumpImportError(
+                f'{label}: пачка из {len(batch)} объектов не загружена: {e}')
+        self.keys[label].record(batch)
+        self.stats[label] += len(batch)
+        batch.clear()
+
+    def discard(self):
+        """Удаляет уже сохранённые пачки, если загрузка не удалась.
+
+        Удаляются только ключи, вставленные самой загрузкой: записи
+        пользователей сайта, сделанные за это время, остаются.
+        """
+        for label, model in reversed(MODELS.items()):
+            inserted = self.keys[label].inserted
+            for start in range(0, len(inserted), DISCARD_RANGES):
+                ranges = Q()
+                for first, last in inserted[start:start + DISCARD_RANGES]:
+                    ranges |= Q(pk__range=(first, last))
+                model._base_manager.filter(ranges)._raw_delete(
+                    connection.alias)
+
+    def finish(self, fts_deferred):
+        """Досчитывает то, что при обычном save() делают сигналы."""
+        imported = Post.objects.filter(pk__gt=self.keys['blog.post'].offset)
+        commented = Post.objects.filter(pk__in=Comments.objects.filter(
+            pk__gt=self.keys['blog.comments'].offset).values('post_id'))
+        with transaction.atomic():
+            (imported | commented).recount_comments()
+            if fts_deferred:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'INSERT INTO blog_post_fts(rowid, title, text) '
+                        'SELECT id, title, text FROM blog_post '
+                        'WHERE id > %s', [self.keys['blog.post'].offset])
+        feed.rebuild(imported | commented)
+        bump_stamp('shared', 'all')
+        bump_feed_generations()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from blog.api import EXPORT_CHUNK_SIZE, export_lines, published_posts
+
+
+class Command(BaseCommand):
+    help = 'Выгружает опубликованные посты в NDJSON, по объекту на строку.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o',
+                            help='Файл для выгрузки; по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, output, chunk_size, **options):
+        lines = export_lines(published_posts().order_by('pk'), chunk_size)
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = 0
+        with open(output, 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stderr.write(f'Выгружено постов: {count}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.comment_queue import BATCH_SIZE, get_queue
+
+
+class Command(BaseCommand):
+    help = ('Переносит комментарии из очереди BLOG_COMMENT_QUEUE '
+            'в основную базу пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='Пауза, когда очередь пуста, в секундах.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Перенести всё, что есть в очереди, и выйти.')
+
+    def handle(self, *args, batch_size, poll_interval, once, **options):
+        queue = get_queue()
+        if queue is None:
+            raise CommandError('Очередь комментариев выключена: '
+                               'задайте BLOG_COMMENT_QUEUE.')
+        if once:
+            total = queue.flush_all(batch_size)
+            self.stdout.write(f'Перенесено комментариев: {total}')
+            return
+        self.stdout.write('Перенос очереди комментариев запущен.')
+        try:
+            queue.run(poll_interval=poll_interval, batch_size=batch_size)
+        except KeyboardInterrupt:
+            pass
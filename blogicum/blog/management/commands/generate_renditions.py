@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from blog.renditions import delete_renditions, generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные копии фото публикаций, у которых их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии у всех публикаций с фото.')
+
+    def handle(self, *args, all, **options):
+        posts = Post.objects.exclude(image='')
+        if not all:
+            posts = posts.filter(image_renditions={})
+        done = 0
+        for post in posts.iterator():
+            if all:
+                delete_renditions(post.image.storage, post.image_renditions)
+            generate_renditions(post)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано публикаций: {done}'))
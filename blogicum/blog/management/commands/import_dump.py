@@ -0,0 +1,42 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.importer import BATCH_SIZE, DumpImporter, DumpImportError
+
+
+class Command(BaseCommand):
+    help = ('Быстро загружает дамп dumpdata (JSON или JSON Lines, можно '
+            '.gz) с пользователями, категориями, местами, постами и '
+            'комментариями. Объекты других моделей пропускаются. '
+            'В отличие от loaddata, объекты не заменяются по ключу: '
+            'повторная загрузка того же дампа создаст копии мест, постов '
+            'и комментариев; пользователи и категории узнаются по '
+            'username и slug.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл дампа или - для stdin.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не снимать индексы и FTS-триггер на время загрузки.')
+
+    def handle(self, *args, path, batch_size, keep_indexes, **options):
+        importer = DumpImporter(batch_size=batch_size,
+                                defer_indexes=not keep_indexes)
+        if path == '-':
+            stream = sys.stdin
+        elif path.endswith('.gz'):
+            stream = gzip.open(path, 'rt', encoding='utf-8')
+        else:
+            stream = open(path, encoding='utf-8')
+        try:
+            stats = importer.run(stream)
+        except DumpImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        for label, count in sorted(stats.items()):
+            self.stdout.write(f'{label}: {count}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog import feed
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает материализованную ленту FeedEntry. '
+            'Нужна после массовой загрузки в обход сигналов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=feed.BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        created = feed.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Строк в ленте: {created}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comment_count и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число постов с неверным счётчиком.')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        if dry_run:
+            drifted = Post.objects.with_comment_drift().count()
+            self.stdout.write(f'Расхождений: {drifted}')
+            return
+        fixed = Post.objects.recount_comments(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Исправлено постов: {fixed}'))
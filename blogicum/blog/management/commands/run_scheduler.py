@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from blog.scheduler import PublicationScheduler
+
+
+class Command(BaseCommand):
+    help = ('Следит за отложенными публикациями и отправляет событие '
+            'post_became_visible, когда наступает их pub_date.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=30,
+            help='Как часто перечитывать базу, в секундах.')
+
+    def handle(self, *args, poll_interval, **options):
+        self.stdout.write('Планировщик публикаций запущен.')
+        try:
+            PublicationScheduler().run(poll_interval=poll_interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from blog.sessions import (SWEEP_BATCH_SIZE, SWEEP_PAUSE, run_sweeper,
+                           sweep_expired)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет просроченные сессии из django_session короткими '
+            'пачками, разово или в цикле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=SWEEP_PAUSE,
+            help='Пауза между пачками, в секундах.')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять раз в столько секунд (0 — один проход).')
+
+    def handle(self, *args, batch_size, pause, interval, **options):
+        if not interval:
+            total = sweep_expired(batch_size=batch_size, pause=pause)
+            self.stdout.write(f'Удалено просроченных сессий: {total}')
+            return
+        self.stdout.write('Очистка сессий запущена.')
+        try:
+            run_sweeper(interval=interval, batch_size=batch_size,
+                        pause=pause)
+        except KeyboardInterrupt:
+            pass
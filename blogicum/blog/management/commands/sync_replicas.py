@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из '
+            'BLOG_READ_REPLICAS (для разработки и тестов).')
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование реплик поддерживается только '
+                               'для SQLite.')
+        primary.ensure_connection()
+        for alias in settings.BLOG_READ_REPLICAS:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'Реплика {alias} — не SQLite.')
+            replica.close()
+            # backup() даёт согласованный снимок даже во время записи.
+            with sqlite3.connect(replica.settings_dict['NAME']) as target:
+                primary.connection.backup(target)
+            self.stdout.write(self.style.SUCCESS(f'Реплика {alias} обновлена'))
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.functional import SimpleLazyObject
+
+from .auth import get_user
+from .querybudget import (QueryBudgetExceeded, QueryRecorder, budget_for,
+                          logger as budget_logger)
+from .routers import read_alias
+from .staticfiles import IMMUTABLE, REVALIDATE, build_index
+
+PRIMARY_COOKIE = 'blog_primary_until'
+
+
+class AsyncCapableMiddleware:
+    """Основа middleware, которое под ASGI не занимает поток.
+
+    Наследник реализует __call__ и __acall__; нужный выбирается по тому,
+    синхронный ли следующий обработчик, как в MiddlewareMixin.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django отличает асинхронное middleware от синхронного.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """Отправляет чтения страниц с use_replica = True в реплики.
+
+    После любого изменяющего запроса клиент получает cookie и ещё
+    BLOG_REPLICA_STICKY_SECONDS читает из основной базы, чтобы сразу
+    увидеть свою публикацию или комментарий, даже если реплика отстаёт.
+    """
+
+    def __call__(self, request):
+        if hasattr(self, '_is_coroutine'):
+            return self.__acall__(request)
+        request._read_alias_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._read_alias_token is not None:
+                read_alias.reset(request._read_alias_token)
+        return self.stick_to_primary(request, response)
+
+    async def __acall__(self, request):
+        # Под ASGI process_view выполняется в другом контексте, и токен
+        # сбросить нельзя; у каждого запроса свой контекст задачи.
+        request._read_alias_token = None
+        response = await self.get_response(request)
+        return self.stick_to_primary(request, response)
+
+    def stick_to_primary(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            sticky = settings.BLOG_REPLICA_STICKY_SECONDS
+            response.set_cookie(PRIMARY_COOKIE, str(int(time.time() + sticky)),
+                                max_age=sticky, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = settings.BLOG_READ_REPLICAS
+        view = getattr(view_func, 'view_class', view_func)
+        if (not replicas or request.method not in ('GET', 'HEAD')
+                or not getattr(view, 'use_replica', False)
+                or self.pinned_to_primary(request)):
+            return None
+        request._read_alias_token = read_alias.set(random.choice(replicas))
+        return None
+
+    @staticmethod
+    def pinned_to_primary(request):
+        try:
+            until = int(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """Считает SQL-запросы доли BLOG_QUERY_SAMPLE_RATE запросов к сайту.
+
+    Превышение BLOG_QUERY_BUDGETS по имени URL и повторяющиеся формы
+    запросов (N+1) пишутся в лог, а при BLOG_QUERY_BUDGET_RAISE = True
+    приводят к исключению. Стоит ставить первым, чтобы учитывались и
+    запросы сессии и пользователя.
+    """
+
+    def __call__(self, request):
+        if hasattr(self, '_is_coroutine'):
+            return self.__acall__(request)
+        if random.random() >= settings.BLOG_QUERY_SAMPLE_RATE:
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.check(request, recorder, response)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.BLOG_QUERY_SAMPLE_RATE:
+            return await self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.check(request, recorder, response)
+
+    def check(self, request, recorder, response):
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        problems = recorder.problems(budget_for(url_name))
+        if problems:
+            message = f'{url_name or request.path}: ' + '; '.join(problems)
+            if settings.BLOG_QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            budget_logger.warning(message)
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware с пользователем из blog.auth."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+class StaticFilesMiddleware(AsyncCapableMiddleware):
+    """Отдаёт собранную статику из STATIC_ROOT до остальных middleware.
+
+    Список файлов читается один раз при старте процесса, поэтому после
+    collectstatic процесс нужно перезапустить. Пока манифеста нет,
+    запросы проходят дальше без изменений.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.files = build_index()
+
+    def __call__(self, request):
+        if hasattr(self, '_is_coroutine'):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ('GET', 'HEAD'):
+            return None
+        encoding, (path, size, etag) = static_file.choose(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'),
+                                    content_type=static_file.content_type)
+            # Имя файла в заголовке было бы именем сжатой копии.
+            del response['Content-Disposition']
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = (IMMUTABLE if static_file.immutable
+                                     else REVALIDATE)
+        if len(static_file.variants) > 1:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
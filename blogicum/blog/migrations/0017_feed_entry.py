@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+EXCERPT_WORDS = 30
+
+
+def fill_feed(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    FeedEntry = apps.get_model('blog', 'FeedEntry')
+    posts = Post.objects.filter(
+        is_published=True, category__is_published=True).select_related(
+        'author', 'category', 'location')
+    entries = []
+    for post in posts.iterator():
+        location = post.location
+        entries.append(FeedEntry(
+            post_id=post.pk, pub_date=post.pub_date, title=post.title,
+            text=' '.join(post.text.split()[:EXCERPT_WORDS])
+            if len(post.text.split()) > EXCERPT_WORDS else post.text,
+            image=post.image.name, image_renditions=post.image_renditions,
+            comment_count=post.comment_count, author_id=post.author_id,
+            author_username=post.author.username,
+            category_id=post.category_id, category_slug=post.category.slug,
+            category_title=post.category.title,
+            location_id=post.location_id,
+            location_name=location.name if location else '',
+            location_is_published=bool(location and location.is_published)))
+    FeedEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0016_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_entry', serialize=False, to='blog.post')),
+                ('pub_date', models.DateTimeField()),
+                ('title', models.CharField(max_length=256)),
+                ('text', models.TextField()),
+                ('image', models.ImageField(blank=True, upload_to='post_images')),
+                ('image_renditions', models.JSONField(blank=True, default=dict)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('author_username', models.CharField(max_length=150)),
+                ('category_slug', models.SlugField(max_length=64)),
+                ('category_title', models.CharField(max_length=256)),
+                ('location_name', models.CharField(blank=True, max_length=256)),
+                ('location_is_published', models.BooleanField(default=False)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.category')),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.location')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['-pub_date', '-post'], name='feed_entry_range_idx'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from .cache import bump_feed_generations, bump_stamp
+from .utils import feed_cutoff
+
 User = get_user_model()
 
 
@@ -45,6 +50,76 @@ class Category(PublishedModel):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def published(self, now=None):
+        return self.filter(pub_date__lte=feed_cutoff(now),
+                           is_published=True,
+                           category__is_published=True)
+
+    def search(self, query):
+        """Полнотекстовый поиск по заголовку и тексту.
+
+        На SQLite — индекс FTS5 blog_post_fts с ранжированием BM25 (поле
+        rank, меньше — релевантнее), на других СУБД — icontains.
+        """
+        words = query.split()
+        no_rank = models.Value(0, output_field=models.FloatField())
+        if not words:
+            return self.none().annotate(rank=no_rank)
+        if connections[self.db].vendor != 'sqlite':
+            condition = models.Q()
+            for word in words:
+                condition &= (models.Q(title__icontains=word)
+                              | models.Q(text__icontains=word))
+            return self.filter(condition).annotate(rank=no_rank)
+        # Каждое слово в кавычках: пользовательский ввод не попадает в
+        # синтаксис FTS5; последнее слово ищется по префиксу.
+        terms = ['"{}"'.format(word.replace('"', '""')) for word in words]
+        terms[-1] += '*'
+        return self.extra(
+            tables=['blog_post_fts'],
+            where=['blog_post_fts.rowid = blog_post.id',
+                   'blog_post_fts MATCH %s'],
+            params=[' '.join(terms)],
+            select={'rank': 'bm25(blog_post_fts, 10.0, 1.0)'},
+        )
+
+    def with_comment_drift(self):
+        return self.annotate(actual_count=Count('comments')).exclude(
+            comment_count=F('actual_count'))
+
+    def recount_comments(self, batch_size=500):
+        """Исправляет comment_count постов с расхождением, возвращает их число.
+
+        Вместе с постом в той же транзакции исправляется его строка
+        FeedEntry; версии постов и поколения их лент меняются, чтобы кеш
+        карточек и страниц показал новый счётчик.
+        """
+        drifted = list(
+            self.with_comment_drift().values_list('pk', flat=True))
+        # У Post и FeedEntry первичный ключ — id поста.
+        counts = Coalesce(Subquery(Comments.objects.filter(
+            post=OuterRef('pk')).order_by().values('post').annotate(
+            total=Count('pk')).values('total')), 0)
+        pages = set()
+        for start in range(0, len(drifted), batch_size):
+            batch = drifted[start:start + batch_size]
+            with transaction.atomic():
+                Post.objects.filter(pk__in=batch).update(comment_count=counts)
+                FeedEntry.objects.filter(post_id__in=batch).update(
+                    comment_count=counts)
+                for post_id in batch:
+                    bump_stamp('post', post_id)
+            pages.update(Post.objects.filter(pk__in=batch).values_list(
+                'category__slug', 'author__username'))
+        if pages:
+            slugs, usernames = zip(*pages)
+            bump_feed_generations({slug for slug in slugs if slug},
+                                  set(usernames))
+        return len(drifted)
+
+
 class Post(PublishedModel):
     title = models.CharField(max_length=256, verbose_name="Заголовок")
     text = models.TextField(verbose_name="Текст")
@@ -69,14 +144,53 @@ class Post(PublishedModel):
         related_name='post'
     )
     image = models.ImageField('Фото', upload_to='post_images', blank=True)
+    image_renditions = models.JSONField(
+        'Уменьшенные копии фото', default=dict, blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False)
+    updated_at = models.DateTimeField('Изменено', auto_now=True)
+
+    objects = PostQuerySet.as_manager()
+
+    # Эти поля меняют отдельные UPDATE: сигналы комментариев и поток
+    # подготовки фото. Обычное сохранение поста их не пишет, иначе
+    # затёрло бы значениями, прочитанными до этих UPDATE.
+    SEPARATELY_UPDATED = frozenset({'comment_count', 'image_renditions'})
 
     class Meta:
         verbose_name = "публикация"
         verbose_name_plural = "Публикации"
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         condition=models.Q(is_published=True),
+                         name='post_feed_idx'),
+            models.Index(fields=('category', '-pub_date', '-id'),
+                         condition=models.Q(is_published=True),
+                         name='post_category_feed_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_feed_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and self.pk is not None
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            skipped = self.SEPARATELY_UPDATED | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+                and field.attname not in skipped]
+        super().save(*args, **kwargs)
+
+    def is_visible(self, now=None):
+        return (self.is_published
+                and self.pub_date <= feed_cutoff(now)
+                and self.category is not None
+                and self.category.is_published)
+
 
 class Comments(models.Model):
     text = models.TextField('Текст комментария', blank=True)
@@ -90,3 +204,86 @@ class Comments(models.Model):
 
     class Meta:
         ordering = ('created_at',)
+        indexes = (
+            models.Index(fields=('post', 'created_at', 'id'),
+                         name='comment_thread_idx'),
+        )
+
+
+class FeedEntry(models.Model):
+    """Строка материализованной ленты главной страницы.
+
+    Хранит видимые публикации (в том числе отложенные) с полями карточки,
+    поэтому страница ленты читается одним диапазонным запросом по индексу.
+    Поддерживается сигналами и командой rebuild_feed.
+    """
+
+    EXCERPT_WORDS = 30
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True,
+        related_name='feed_entry')
+    pub_date = models.DateTimeField()
+    title = models.CharField(max_length=256)
+    text = models.TextField()
+    image = models.ImageField(upload_to='post_images', blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    comment_count = models.PositiveIntegerField(default=0)
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+')
+    author_username = models.CharField(max_length=150)
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name='+')
+    category_slug = models.SlugField(max_length=64)
+    category_title = models.CharField(max_length=256)
+    location = models.ForeignKey(
+        Location, on_delete=models.SET_NULL, null=True, related_name='+')
+    location_name = models.CharField(max_length=256, blank=True)
+    location_is_published = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('-pub_date', '-post'),
+                         name='feed_entry_range_idx'),
+        )
+
+    @classmethod
+    def fields_from_post(cls, post):
+        words = post.text.split()
+        text = (post.text if len(words) <= cls.EXCERPT_WORDS
+                else ' '.join(words[:cls.EXCERPT_WORDS]))
+        location = post.location
+        return {
+            'pub_date': post.pub_date,
+            'title': post.title,
+            'text': text,
+            'image': post.image.name,
+            'image_renditions': post.image_renditions,
+            'comment_count': post.comment_count,
+            'author_id': post.author_id,
+            'author_username': post.author.username,
+            'category_id': post.category_id,
+            'category_slug': post.category.slug,
+            'category_title': post.category.title,
+            'location_id': post.location_id,
+            'location_name': location.name if location else '',
+            'location_is_published': bool(location and location.is_published),
+        }
+
+    def as_post(self):
+        """Несохранённый Post с полями, которые читает post_card.html."""
+        post = Post(
+            id=self.post_id, title=self.title, text=self.text,
+            pub_date=self.pub_date, image=self.image.name,
+            image_renditions=self.image_renditions, is_published=True,
+            comment_count=self.comment_count, author_id=self.author_id,
+            category_id=self.category_id, location_id=self.location_id)
+        post.author = User(id=self.author_id, username=self.author_username)
+        post.category = Category(
+            id=self.category_id, slug=self.category_slug,
+            title=self.category_title, is_published=True)
+        if self.location_id:
+            post.location = Location(
+                id=self.location_id, name=self.location_name,
+                is_published=self.location_is_published)
+        return post
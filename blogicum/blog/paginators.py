@@ -0,0 +1,113 @@
+import base64
+from datetime import datetime
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(moment, pk):
+    raw = f'{moment.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        moment, pk = raw.split('|')
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidPage('Неверный курсор страницы')
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Ожидает queryset, отсортированный по убыванию pub_date и id.
+    """
+
+    key_field = 'pub_date'
+    descending = True
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @cached_property
+    def count(self):
+        # Считается только по требованию: шаблон ленты его не использует.
+        return self.object_list.count()
+
+    def beyond(self, cursor, lookup):
+        value, pk = decode_cursor(cursor)
+        return (Q(**{f'{self.key_field}__{lookup}': value})
+                | Q(**{self.key_field: value, f'pk__{lookup}': pk}))
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.key_field), obj.pk)
+
+    def page(self, after=None, before=None):
+        forward, backward = ('lt', 'gt') if self.descending else ('gt', 'lt')
+        queryset = self.object_list
+        if before:
+            prefix = '' if self.descending else '-'
+            queryset = queryset.filter(self.beyond(before, backward)).order_by(
+                f'{prefix}{self.key_field}', f'{prefix}pk')
+        elif after:
+            queryset = queryset.filter(self.beyond(after, forward))
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if before:
+            items.reverse()
+        if not items:
+            return CursorPage(items, self, None, None)
+        first, last = items[0], items[-1]
+        if before:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(after)
+        return CursorPage(
+            items, self,
+            self.cursor_for(last) if has_next else None,
+            self.cursor_for(first) if has_previous else None,
+        )
+
+
+class CommentPaginator(CursorPaginator):
+    """Ветка комментариев по ключу (created_at, id) от старых к новым."""
+
+    key_field = 'created_at'
+    descending = False
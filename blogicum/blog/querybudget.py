@@ -0,0 +1,109 @@
+"""Учёт SQL-запросов запроса: бюджеты по имени URL и поиск N+1.
+
+Запросы перехватываются обёрткой execute_wrappers, поэтому учёт работает
+и без DEBUG; в бою включается только для доли запросов. Активный учёт
+хранится в ContextVar и виден из потоков sync_to_async, так что запросы
+асинхронных представлений тоже попадают в него.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос к сайту превысил бюджет SQL-запросов или содержит N+1."""
+
+
+def normalize_sql(sql):
+    """Форма запроса: без чисел, с IN-списком любой длины как (...)."""
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+_active_recorder = ContextVar('active_query_recorder', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _active_recorder.get()
+    while recorder is not None:
+        recorder.queries.append(sql)
+        recorder = recorder.parent
+    return execute(sql, params, many, context)
+
+
+def install_wrapper(connection, **kwargs):
+    """Ставит обёртку учёта на подключение.
+
+    Без активного учёта она стоит одного ContextVar.get() на запрос.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_wrapper)
+
+
+class QueryRecorder:
+    """Записывает SQL всех подключений, пока активен как контекст."""
+
+    def __init__(self):
+        self.queries = []
+        self.parent = None
+        self._token = None
+
+    def __enter__(self):
+        # Подключения, открытые до импорта модуля, сигнала не получали.
+        for connection in connections.all():
+            install_wrapper(connection)
+        self.parent = _active_recorder.get()
+        self._token = _active_recorder.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorder.reset(self._token)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """Формы, выполненные не меньше threshold раз, — признак N+1."""
+        if threshold is None:
+            threshold = settings.BLOG_QUERY_REPEAT_THRESHOLD
+        shapes = Counter(normalize_sql(sql) for sql in self.queries)
+        return {shape: count for shape, count in shapes.items()
+                if count >= threshold}
+
+    def problems(self, budget=None, threshold=None):
+        found = []
+        if budget is not None and len(self) > budget:
+            found.append(f'{len(self)} запросов при бюджете {budget}')
+        for shape, count in self.repeated_shapes(threshold).items():
+            found.append(f'N+1: {count} раз {shape}')
+        return found
+
+
+@contextmanager
+def query_budget(budget=None, threshold=None, label='блок'):
+    """Тестовый помощник: падает, если код внутри нарушил бюджет."""
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = recorder.problems(budget, threshold)
+    if problems:
+        raise QueryBudgetExceeded(f'{label}: ' + '; '.join(problems))
+
+
+def budget_for(url_name):
+    return settings.BLOG_QUERY_BUDGETS.get(url_name)
@@ -0,0 +1,123 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Ключ image_renditions у фото, которое не удалось декодировать: такое
+# фото не ставится в очередь заново при каждом показе.
+FAILED = 'failed'
+
+_executor = None
+_pending = set()
+_pending_lock = Lock()
+
+
+def rendition_name(image_name, width, fmt):
+    stem, _ = posixpath.splitext(image_name)
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{stem}_{width}w.{extension}'
+
+
+def render_image(image_file, widths):
+    """Возвращает {формат: {ширина: байты}} для ширин не больше исходной."""
+    with Image.open(image_file) as source:
+        source.load()
+        image = source.convert('RGB')
+    targets = sorted({min(width, image.width) for width in widths})
+    result = {fmt: {} for fmt in FORMATS}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt, (pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            result[fmt][width] = buffer.getvalue()
+    return result
+
+
+def delete_renditions(storage, renditions):
+    for fmt in FORMATS:
+        for name in (renditions or {}).get(fmt, {}).values():
+            storage.delete(name)
+
+
+def generate_renditions(post):
+    """Создаёт уменьшенные копии post.image и записывает их в модель."""
+    if not post.image:
+        return {}
+    storage = post.image.storage
+    try:
+        with post.image.open('rb') as image_file:
+            rendered = render_image(image_file, settings.BLOG_IMAGE_WIDTHS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Не удалось декодировать фото поста %s', post.pk,
+                       exc_info=True)
+        rendered = None
+    renditions = {FAILED: True} if rendered is None else {}
+    for fmt, by_width in (rendered or {}).items():
+        renditions[fmt] = {}
+        for width, content in by_width.items():
+            # Занятое имя storage заменит свободным и вернёт его.
+            renditions[fmt][str(width)] = storage.save(
+                rendition_name(post.image.name, width, fmt),
+                ContentFile(content))
+    post.image_renditions = renditions
+    post.save(update_fields=('image_renditions', 'updated_at'))
+    return renditions
+
+
+def _run(post_id):
+    from .models import Post
+
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is not None and not post.image_renditions:
+            generate_renditions(post)
+    except Exception:
+        logger.exception('Не удалось подготовить изображения поста %s',
+                         post_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(post_id)
+
+
+def _run_in_thread(post_id):
+    close_old_connections()
+    try:
+        _run(post_id)
+    finally:
+        close_old_connections()
+
+
+def _submit(post_id):
+    global _executor
+    with _pending_lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+        if settings.BLOG_RENDITIONS_ASYNC and _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BLOG_RENDITION_WORKERS,
+                thread_name_prefix='renditions')
+    if settings.BLOG_RENDITIONS_ASYNC:
+        _executor.submit(_run_in_thread, post_id)
+    else:
+        _run(post_id)
+
+
+def schedule_renditions(post_id):
+    """Ставит подготовку изображений в фоновую очередь после коммита."""
+    transaction.on_commit(lambda: _submit(post_id))
@@ -0,0 +1,40 @@
+from contextvars import ContextVar
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+def reading_replica():
+    """Читает ли текущий запрос из реплики.
+
+    Реплика может отставать: то, что из неё прочитано, не кладётся в
+    кеш и не помечается ETag, иначе устаревшая копия переживёт догон.
+    """
+    return read_alias.get() is not None
+
+
+def read_from_primary():
+    """Остаток запроса читает из основной базы.
+
+    ReplicaMiddleware по окончании запроса всё равно вернёт прежнее
+    значение своим токеном.
+    """
+    read_alias.set(None)
+
+
+class ReplicaRouter:
+    """Чтения идут в реплику, выбранную ReplicaMiddleware для запроса.
+
+    Вне такого запроса, а также для всех записей — основная база.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,111 @@
+"""Планировщик отложенных публикаций.
+
+Держит кучу ближайших pub_date и, когда дата наступает, отправляет
+сигнал post_became_visible. На него подписываются кеши, счётчики и лента.
+"""
+import heapq
+import logging
+import threading
+
+from django.db import close_old_connections
+from django.dispatch import Signal
+
+from .models import Post
+from .utils import feed_cutoff, get_clock, visible_since
+
+logger = logging.getLogger(__name__)
+
+# Аргументы: post — опубликованный пост с author и category.
+post_became_visible = Signal()
+
+
+class PublicationScheduler:
+    """Мин-куча (pub_date, post_id) будущих публикаций.
+
+    Куча заполняется из базы методом refresh(); записи, чья дата с тех пор
+    изменилась, не удаляются из кучи, а пропускаются при извлечении.
+    Момент публикации считается так же, как в Post.objects.published():
+    по feed_cutoff(), поэтому событие совпадает с появлением поста в ленте.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or get_clock()
+        self._heap = []
+        self._scheduled = {}
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def schedule(self, post_id, pub_date):
+        if self._scheduled.get(post_id) == pub_date:
+            return
+        self._scheduled[post_id] = pub_date
+        heapq.heappush(self._heap, (pub_date, post_id))
+
+    def refresh(self):
+        """Подтягивает из базы новые и перенесённые отложенные посты."""
+        cutoff = feed_cutoff(self.clock())
+        upcoming = dict(Post.objects.filter(
+            is_published=True, category__is_published=True,
+            pub_date__gt=cutoff,
+        ).values_list('pk', 'pub_date'))
+        # Наступившие записи остаются: их проверит run_pending().
+        for post_id, pub_date in list(self._scheduled.items()):
+            if post_id not in upcoming and pub_date > cutoff:
+                del self._scheduled[post_id]
+        for post_id, pub_date in upcoming.items():
+            self.schedule(post_id, pub_date)
+
+    def next_due(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def run_pending(self):
+        """Отправляет события для наступивших публикаций, возвращает их."""
+        cutoff = feed_cutoff(self.clock())
+        due = {}
+        while self._heap and self._heap[0][0] <= cutoff:
+            pub_date, post_id = heapq.heappop(self._heap)
+            if self._scheduled.get(post_id) == pub_date:
+                del self._scheduled[post_id]
+                due[post_id] = pub_date
+        if not due:
+            return []
+        # Пост могли снять с публикации или перенести после refresh().
+        posts = [
+            post for post in Post.objects.published(cutoff).filter(
+                pk__in=due).select_related('author', 'category')
+            if post.pub_date == due[post.pk]
+        ]
+        for post in posts:
+            post_became_visible.send(sender=Post, post=post)
+        return posts
+
+    def _drop_stale(self):
+        while self._heap:
+            pub_date, post_id = self._heap[0]
+            if self._scheduled.get(post_id) == pub_date:
+                return
+            heapq.heappop(self._heap)
+
+    def run(self, stop_event=None, poll_interval=30):
+        """Цикл: спит до ближайшей даты, но не дольше poll_interval.
+
+        Раз в poll_interval секунд перечитывает базу, чтобы заметить посты,
+        созданные или перенесённые другими процессами.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_pending()
+                self.refresh()
+            except Exception:
+                logger.exception('Сбой планировщика публикаций')
+            timeout = poll_interval
+            next_due = self.next_due()
+            if next_due is not None:
+                until_due = (visible_since(next_due)
+                             - self.clock()).total_seconds()
+                timeout = min(poll_interval, max(until_due, 0))
+            stop_event.wait(timeout)
@@ -0,0 +1,77 @@
+"""Сессии: чтение из кеша, запись в базу только при изменении данных.
+
+Движок для SESSION_ENGINE = 'blog.sessions' (BLOG_SESSION_MODE =
+'cache_db'). Django сохраняет сессию, если в неё что-то присваивали,
+даже то же самое значение; здесь такая запись пропускается. Просроченные
+строки django_session удаляет sweep_expired() небольшими пачками, чтобы
+не держать блокировку записи SQLite на весь DELETE, как clearsessions.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 500
+SWEEP_PAUSE = 0.05
+
+
+class SessionStore(cached_db.SessionStore):
+
+    def load(self):
+        data = super().load()
+        self._saved_digest = self.digest(data)
+        return data
+
+    def digest(self, data):
+        return hashlib.sha1(self.serializer().dumps(data)).digest()
+
+    def save(self, must_create=False):
+        if (not must_create and self.session_key is not None
+                and getattr(self, '_saved_digest', None)
+                == self.digest(self._session)):
+            return
+        super().save(must_create)
+        self._saved_digest = self.digest(self._session)
+
+    @classmethod
+    def clear_expired(cls):
+        sweep_expired()
+
+
+def sweep_expired(batch_size=SWEEP_BATCH_SIZE, pause=SWEEP_PAUSE, now=None):
+    """Удаляет просроченные сессии пачками, возвращает их число.
+
+    Каждая пачка — отдельный короткий DELETE по первичному ключу, между
+    пачками пауза, чтобы запросы сайта успевали писать в базу.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        keys = list(Session.objects.filter(expire_date__lt=now).values_list(
+            'session_key', flat=True)[:batch_size])
+        if not keys:
+            return total
+        Session.objects.filter(session_key__in=keys).delete()
+        total += len(keys)
+        if len(keys) < batch_size:
+            return total
+        time.sleep(pause)
+
+
+def run_sweeper(stop_event=None, interval=3600, **options):
+    """Цикл: sweep_expired() раз в interval секунд."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            sweep_expired(**options)
+        except Exception:
+            logger.exception('Сбой очистки просроченных сессий')
+        stop_event.wait(interval)
@@ -0,0 +1,208 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import feed
+from .auth import forget_locally
+from .cache import bump_feed_generations, bump_stamp
+from .renditions import delete_renditions, schedule_renditions
+from .scheduler import post_became_visible
+from .models import Category, Comments, FeedEntry, Location, Post
+
+User = get_user_model()
+
+# Посты, которые удаляет текущий поток: их комментарии уходят вместе с
+# ними, и счётчик и страницы поста из-за каждого комментария не трогаются.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    # Комментарии удаляются раньше поста, их обработчики уже отработали.
+    deleting_posts().discard(instance.pk)
+
+
+@receiver(post_save, sender=Comments)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Правка комментария тоже меняет Post.updated_at: это время последнего
+    # изменения страницы поста вместе с веткой комментариев.
+    changes = {'updated_at': timezone.now()}
+    if created:
+        changes['comment_count'] = F('comment_count') + 1
+        FeedEntry.objects.filter(post_id=instance.post_id).update(
+            comment_count=F('comment_count') + 1)
+    Post.objects.filter(pk=instance.post_id).update(**changes)
+
+
+@receiver(post_delete, sender=Comments)
+def decrement_comment_count(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1, updated_at=timezone.now())
+    FeedEntry.objects.filter(
+        post_id=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_stamp(sender, instance, **kwargs):
+    bump_stamp('post', instance.pk)
+
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def bump_commented_post_stamp(sender, instance, **kwargs):
+    if instance.post_id not in deleting_posts():
+        bump_stamp('post', instance.post_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_stamp(sender, instance, **kwargs):
+    bump_stamp('category', instance.pk)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def bump_location_stamp(sender, instance, **kwargs):
+    bump_stamp('location', instance.pk)
+
+
+def is_login_update(kwargs):
+    return kwargs.get('update_fields') == frozenset({'last_login'})
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_stamp(sender, instance, **kwargs):
+    if not is_login_update(kwargs):
+        # Новая версия заодно делает недействительной запись blog.auth.
+        bump_stamp('user', instance.pk)
+        forget_locally(instance.pk)
+
+
+def image_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Post)
+def remember_post_category(sender, instance, **kwargs):
+    instance._initial_category_id = instance.__dict__.get('category_id')
+    # None — поле отложено через only() и при сохранении не меняется.
+    instance._initial_image = (image_name(instance.__dict__['image'])
+                               if 'image' in instance.__dict__ else None)
+
+
+@receiver(post_save, sender=Post)
+def refresh_post_renditions(sender, instance, created, **kwargs):
+    if kwargs.get('raw') or (not created and instance._initial_image is None):
+        return
+    image = image_name(instance.image)
+    if not created and image == instance._initial_image:
+        return
+    instance._initial_image = image
+    if instance.image_renditions:
+        delete_renditions(instance.image.storage, instance.image_renditions)
+        instance.image_renditions = {}
+        Post.objects.filter(pk=instance.pk).update(image_renditions={})
+    if image:
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_pages(sender, instance, **kwargs):
+    category_ids = {instance.category_id, instance._initial_category_id}
+    bump_feed_generations(
+        Category.objects.filter(pk__in=category_ids - {None}).values_list(
+            'slug', flat=True),
+        User.objects.filter(pk=instance.author_id).values_list(
+            'username', flat=True))
+    instance._initial_category_id = instance.category_id
+
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def bump_commented_post_pages(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'category__slug', 'author__username').first()
+    if post is not None:
+        category_slug, username = post
+        bump_feed_generations([category_slug] if category_slug else [],
+                              [username])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def bump_shared_pages(sender, instance, **kwargs):
+    bump_stamp('shared', 'all')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_pages(sender, instance, **kwargs):
+    if not is_login_update(kwargs):
+        bump_stamp('shared', 'all')
+
+
+# Материализованная лента. Обработчик поста зарегистрирован последним:
+# он перечитывает пост уже после остальных обновлений.
+
+@receiver(post_save, sender=Post)
+def sync_feed_post(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        feed.sync_post(instance.pk)
+
+
+@receiver(post_init, sender=Category)
+def remember_category_visibility(sender, instance, **kwargs):
+    instance._initial_is_published = instance.__dict__.get('is_published')
+
+
+@receiver(post_save, sender=Category)
+def sync_feed_category(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        feed.sync_category(instance, instance._initial_is_published)
+        instance._initial_is_published = instance.is_published
+
+
+@receiver(post_save, sender=Location)
+def sync_feed_location(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        feed.sync_location(instance)
+
+
+@receiver(post_save, sender=User)
+def sync_feed_author(sender, instance, **kwargs):
+    if not kwargs.get('raw') and not is_login_update(kwargs):
+        feed.sync_author(instance)
+
+
+@receiver(post_became_visible)
+def bump_published_post_pages(sender, post, **kwargs):
+    bump_stamp('post', post.pk)
+    bump_feed_generations([post.category.slug], [post.author.username])
@@ -0,0 +1,133 @@
+"""Статика с хешем в имени и заранее сжатыми копиями.
+
+collectstatic через CompressedManifestStaticFilesStorage пишет в
+STATIC_ROOT файлы вида bootstrap.min.4f2a….css, манифест и рядом с
+текстовыми файлами .gz и, если установлен пакет brotli, .br. Файлы из
+STATIC_ROOT отдаёт StaticFilesMiddleware: сжатую копию по Accept-Encoding,
+а файлы с хешем — с Cache-Control: immutable, чтобы повторный визит не
+скачивал их вовсе.
+"""
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = frozenset({
+    '.css', '.js', '.map', '.svg', '.ico', '.txt', '.json', '.xml', '.html',
+})
+# Сжатая копия, выигрывающая меньше 5 %, не пишется.
+MIN_SAVING = 0.05
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Пишет path.gz и path.br рядом с файлом, возвращает их суффиксы."""
+    path = Path(path)
+    data = path.read_bytes()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    written = []
+    for suffix, compressed in variants.items():
+        target = path.with_name(path.name + suffix)
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            target.write_bytes(compressed)
+            written.append(suffix)
+        elif target.exists():
+            target.unlink()
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Манифест хешированных имён плюс сжатые копии текстовых файлов."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name, hashed_name in self.hashed_files.items():
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                for stored in {name, hashed_name}:
+                    compress_file(self.path(stored))
+
+    def stored_name(self, name):
+        # До первой сборки манифеста нет: ссылки ведут на исходные имена,
+        # которые в DEBUG отдаёт runserver из STATICFILES_DIRS.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+class StaticFile:
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = (mimetypes.guess_type(path)[0]
+                             or 'application/octet-stream')
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            variant = path + suffix
+            if os.path.exists(variant):
+                self.variants[encoding] = self.describe(variant)
+        self.variants[None] = self.describe(path)
+
+    @staticmethod
+    def describe(path):
+        stat = os.stat(path)
+        return path, stat.st_size, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def choose(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().partition('=')[2] if params else '1'
+        try:
+            if float(quality or 1) > 0:
+                accepted.add(coding.strip().lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+def build_index():
+    """{URL: StaticFile} для всех файлов STATIC_ROOT, кроме сжатых копий.
+
+    Пусто, пока collectstatic не собрал манифест.
+    """
+    if not settings.STATIC_ROOT:
+        return {}
+    storage = CompressedManifestStaticFilesStorage()
+    if not storage.exists(storage.manifest_name):
+        return {}
+    hashed = set(storage.load_manifest().values())
+    root = Path(storage.location)
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    index = {}
+    for directory, _, names in os.walk(root):
+        for filename in names:
+            if filename.endswith(suffixes):
+                continue
+            path = os.path.join(directory, filename)
+            name = Path(path).relative_to(root).as_posix()
+            index[settings.STATIC_URL + name] = StaticFile(
+                path, immutable=name in hashed)
+    return index
@@ -0,0 +1,21 @@
+from django import template
+
+from blog.renditions import FAILED, schedule_renditions
+
+register = template.Library()
+
+
+@register.filter
+def srcset(post, fmt):
+    """Собирает srcset из готовых копий или ставит их подготовку в очередь."""
+    if not post.image:
+        return ''
+    renditions = post.image_renditions.get(fmt)
+    if not renditions:
+        if FAILED not in post.image_renditions:
+            schedule_renditions(post.pk)
+        return ''
+    return ', '.join(
+        f'{post.image.storage.url(name)} {width}w'
+        for width, name in sorted(renditions.items(),
+                                  key=lambda item: int(item[0])))
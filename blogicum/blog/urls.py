@@ -1,18 +1,37 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
 
 app_name = 'blog'
 
+if settings.BLOG_ASYNC_VIEWS:
+    read_views = {
+        'index': async_views.index,
+        'post_detail': async_views.post_detail,
+        'category_posts': async_views.category_posts,
+        'profile': async_views.profile,
+    }
+else:
+    read_views = {
+        'index': views.IndexView.as_view(),
+        'post_detail': views.PostDetailView.as_view(),
+        'category_posts': views.CategoryPostsView.as_view(),
+        'profile': views.ProfileView.as_view(),
+    }
+
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('posts/<int:post_id>/', views.PostDetailView.as_view(),
+    path('', read_views['index'], name='index'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('posts/<int:post_id>/', read_views['post_detail'],
          name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('category/<slug:category_slug>/',
-         views.CategoryPostsView.as_view(),
+         read_views['category_posts'],
          name='category_posts'),
     path('profile/<str:username>/',
-         views.ProfileView.as_view(),
+         read_views['profile'],
          name='profile'),
     path('profile/<str:username>/edit/',
          views.edit_profile,
@@ -35,4 +54,11 @@ urlpatterns = [
     path('posts/<int:post_id>/delete_comment/<int:comment_id>/',
          views.CommentsDeleteView.as_view(),
          name='delete_comment'),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/posts/export.ndjson', api.export_posts,
+         name='api_export'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('api/posts/<int:post_id>/comments/', api.comment_list,
+         name='api_comments'),
+    path('api/categories/', api.category_list, name='api_categories'),
 ]
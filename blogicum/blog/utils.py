@@ -0,0 +1,40 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+def get_clock():
+    """Часы ленты: BLOG_CLOCK из настроек или timezone.now."""
+    clock = getattr(settings, 'BLOG_CLOCK', None)
+    if clock is None:
+        return timezone.now
+    if isinstance(clock, str):
+        return import_string(clock)
+    return clock
+
+
+def feed_cutoff(now=None):
+    """Граница видимости ленты, округлённая вниз до BLOG_FEED_BUCKET.
+
+    Отложенный пост не появляется раньше своей даты, а позже — не более
+    чем на одну корзину. Одно и то же значение в пределах корзины пригодно
+    как часть ключа кеша.
+    """
+    if now is None:
+        now = get_clock()()
+    bucket = getattr(settings, 'BLOG_FEED_BUCKET', 60)
+    if not bucket:
+        return now
+    rounded = now.timestamp() // bucket * bucket
+    return datetime.fromtimestamp(rounded, tz=dt_timezone.utc)
+
+
+def visible_since(pub_date):
+    """Момент, с которого feed_cutoff() пропускает пост с датой pub_date."""
+    bucket = getattr(settings, 'BLOG_FEED_BUCKET', 60)
+    if not bucket:
+        return pub_date
+    rounded = -(-pub_date.timestamp() // bucket) * bucket
+    return datetime.fromtimestamp(rounded, tz=dt_timezone.utc)
@@ -1,105 +1,293 @@
+import hashlib
+from urllib.parse import urlencode
+
 from django.shortcuts import get_object_or_404, render, redirect
-from django.http import Http404
-from django.utils import timezone
-from .models import Post, Category, Comments
+from django.http import Http404, HttpResponse
+from django.core.cache import cache
+from .models import Post, Category, Comments, FeedEntry
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from .forms import ProfileEditForm, CreatePostForm, CommentsForm
-from django.core.paginator import Paginator
 from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import (UpdateView, DeleteView,
                                   ListView, CreateView,
                                   DetailView, )
-from django.db.models import Count
+from django.db import transaction
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from .comment_queue import get_queue
+from .paginators import CommentPaginator, CursorPaginator
+from .routers import read_from_primary, reading_replica
+from .utils import feed_cutoff
+from .cache import (attach_card_versions, get_stamps, page_cache_key,
+                    scope_generation)
+from django.views.decorators.http import condition
+
 
+POST_CARD_FIELDS = (
+    'title', 'text', 'pub_date', 'image', 'image_renditions',
+    'is_published', 'comment_count',
+    'author__username',
+    'category__slug', 'category__title', 'category__is_published',
+    'location__name', 'location__is_published',
+)
 
-def filter_queryset(queryset):
-    return queryset.filter(pub_date__lte=timezone.now(),
-                           is_published=True,
-                           category__is_published=True)
+
+def feed_queryset(queryset):
+    return queryset.select_related(
+        'author', 'category', 'location').only(
+        *POST_CARD_FIELDS).order_by('-pub_date', '-pk')
 
 
 @login_required
 def add_comment(request, comment_id):
     post = get_object_or_404(Post, pk=comment_id)
     form = CommentsForm(request.POST)
-    if form.is_valid():
+    queue = get_queue()
+    if form.is_valid() and queue is not None:
+        # Комментарий появится на странице после flush_comments.
+        queue.append(post.pk, request.user.pk, form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('..')
 
 
-class IndexView(ListView):
-    model = Post
-    queryset = filter_queryset(
-        Post.objects.annotate(comment_count=Count('comments')))
+class FeedMixin:
     paginate_by = 10
+
+    def paginate_queryset(self, queryset, page_size):
+        if not settings.BLOG_CURSOR_PAGINATION:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'),
+                                  before=self.request.GET.get('before'))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_card_versions(context['page_obj'])
+        return context
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 до рендера, если совпал ETag.
+
+    Наследник задаёт get_etag(). Last-Modified не отдаётся: дата поста не
+    меняется ни при входе читателя, ни при правке категории, места или
+    автора, и по If-Modified-Since клиент получил бы устаревшую страницу.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        def etag(request, *args, **kwargs):
+            value = self.get_etag()
+            if value is None or reading_replica():
+                return None
+            value = f'{value}:{request.user.pk}'
+            if request.user.is_authenticated:
+                # Страница вошедшего содержит формы с CSRF-токеном: после
+                # нового входа старая копия отдала бы 403 при отправке.
+                value += (f':{request.session.session_key}'
+                          f':{request.META.get("CSRF_COOKIE", "")}')
+            return hashlib.md5(value.encode()).hexdigest()
+
+        view = condition(etag_func=etag)(super().dispatch)
+        return view(request, *args, **kwargs)
+
+
+class AnonymousPageCacheMixin:
+    cache_scope = None
+    cache_scope_kwarg = None
+
+    def get_cache_scopes(self):
+        if self.cache_scope_kwarg is None:
+            return [(self.cache_scope, 'all')]
+        return [(self.cache_scope, self.kwargs[self.cache_scope_kwarg])]
+
+    def get_etag(self):
+        return (f'{self.request.get_full_path()}:'
+                f'{scope_generation(self.get_cache_scopes())}')
+
+    def uses_page_cache(self, request):
+        return bool(settings.BLOG_PAGE_CACHE_TIMEOUT
+                    and request.method == 'GET'
+                    and not request.user.is_authenticated)
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        if self.uses_page_cache(request):
+            # Страница ляжет в кеш и получит ETag: промах рендерится из
+            # основной базы, а не из реплики, которая может отставать.
+            read_from_primary()
+
+    def dispatch(self, request, *args, **kwargs):
+        timeout = settings.BLOG_PAGE_CACHE_TIMEOUT
+        if not self.uses_page_cache(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = page_cache_key(request, self.get_cache_scopes())
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not reading_replica():
+            response.add_post_render_callback(
+                lambda response: cache.set(key, response.content, timeout))
+        return response
+
+
+class IndexView(ConditionalGetMixin, AnonymousPageCacheMixin,
+                FeedMixin, ListView):
+    model = Post
+    cache_scope = 'feed'
+    use_replica = True
     template_name = 'blog/index.html'
-    ordering = '-pub_date'
+
+    def get_queryset(self):
+        # Лента читается из материализованной таблицы без JOIN-ов.
+        return FeedEntry.objects.filter(
+            pub_date__lte=feed_cutoff()).order_by('-pub_date', '-post')
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = (
+            super().paginate_queryset(queryset, page_size))
+        page.object_list = [entry.as_post() for entry in page]
+        return paginator, page, page.object_list, is_paginated
 
 
-class PostDetailView(DetailView):
+class SearchView(ListView):
     model = Post
+    paginate_by = 10
+    template_name = 'blog/search.html'
+    use_replica = True
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return feed_queryset(Post.objects.published().search(
+            self.query)).order_by('rank', '-pub_date')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['page_query'] = urlencode({'q': self.query}) + '&'
+        attach_card_versions(context['page_obj'])
+        return context
+
+
+class CachedObjectMixin:
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+
+class PostDetailView(CachedObjectMixin, ConditionalGetMixin, DetailView):
+    queryset = Post.objects.select_related('author', 'category', 'location')
     template_name = 'blog/detail.html'
     pk_url_kwarg = 'post_id'
+    use_replica = True
 
     def dispatch(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, pk=kwargs['post_id'])
-        if not post.is_published and post.author != request.user:
+        post = self.get_object()
+        if post.author_id != request.user.pk and not post.is_visible():
             raise Http404
         else:
             return super().dispatch(request, *args, **kwargs)
 
+    def get_etag(self):
+        post = self.get_object()
+        stamps = get_stamps([('post', post.pk), ('user', post.author_id),
+                             ('category', post.category_id),
+                             ('location', post.location_id),
+                             ('shared', 'all')])
+        return '-'.join(str(stamp) for stamp in stamps.values())
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentsForm()
-        comments = self.object.comments.select_related('author')
-        context['comments'] = comments
-        context['comment_count'] = comments.count()
+        context['comments'] = comment_page(
+            self.object.pk, self.request.GET.get('comments_after'))
+        context['comment_count'] = self.object.comment_count
         return context
 
 
-class CategoryPostsView(ListView):
-    model = Category
+def comment_page(post_id, after=None):
+    """Порция комментариев поста после курсора after."""
+    comments = Comments.objects.filter(post_id=post_id).select_related(
+        'author').order_by('created_at', 'pk')
+    try:
+        return CommentPaginator(
+            comments, settings.BLOG_COMMENTS_PER_PAGE).page(after=after)
+    except InvalidPage as e:
+        raise Http404(str(e))
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом для подгрузки."""
+    post = get_object_or_404(
+        Post.objects.select_related('category'), pk=post_id)
+    if post.author_id != request.user.pk and not post.is_visible():
+        raise Http404
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        'comments': comment_page(post_id, request.GET.get('after')),
+    })
+
+
+post_comments.use_replica = True
+
+
+class CategoryPostsView(ConditionalGetMixin, AnonymousPageCacheMixin,
+                        FeedMixin, ListView):
+    model = Post
     template_name = 'blog/category.html'
     slug_url_kwarg = 'category_slug'
-    paginate_by = 10
+    cache_scope = 'category'
+    cache_scope_kwarg = 'category_slug'
+    use_replica = True
+
+    def get_queryset(self):
+        self.category = get_object_or_404(Category.objects.filter(
+            is_published=True), slug=self.kwargs['category_slug'])
+        return feed_queryset(
+            Post.objects.published().filter(category=self.category))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category = get_object_or_404(Category.objects.filter(
-            is_published=True), slug=self.kwargs['category_slug'])
-        context["category"] = category
-        posts = category.post.filter(
-            pub_date__lte=timezone.now(), is_published=True).annotate(
-            comment_count=Count('comments')).order_by('-pub_date')
-        paginator = Paginator(posts, self.paginate_by)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        context["page_obj"] = page_obj
+        context["category"] = self.category
         return context
 
 
-class ProfileView(ListView):
+class ProfileView(ConditionalGetMixin, AnonymousPageCacheMixin,
+                  FeedMixin, ListView):
     model = Post
-    paginate_by = 10
+    cache_scope = 'author'
+    cache_scope_kwarg = 'username'
+    use_replica = True
     template_name = 'blog/profile.html'
 
     def get_queryset(self):
         try:
-            user = User.objects.get(username=self.kwargs['username'])
+            self.profile = User.objects.get(username=self.kwargs['username'])
         except User.DoesNotExist:
             raise Http404("Пользователь не найден")
-        return Post.objects.filter(author=user).annotate(
-            comment_count=Count('comments')).order_by('-pub_date')
+        posts = Post.objects.filter(author=self.profile)
+        if self.profile != self.request.user:
+            posts = posts.published()
+        return feed_queryset(posts)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = User.objects.filter(username=self.kwargs['username']).first()
-        context['profile'] = user
+        context['profile'] = self.profile
         return context
 
 
@@ -128,14 +316,14 @@ class CreatePostView(LoginRequiredMixin, CreateView):
                        kwargs={'username': self.request.user.username})
 
 
-class PostMixin(LoginRequiredMixin):
+class PostMixin(CachedObjectMixin, LoginRequiredMixin):
     model = Post
     template_name = 'blog/create.html'
     pk_url_kwarg = 'post_id'
 
     def dispatch(self, request, *args, **kwargs):
-        instance = get_object_or_404(Post, pk=kwargs['post_id'])
-        if instance.author != request.user:
+        instance = self.get_object()
+        if instance.author_id != request.user.pk:
             return redirect('blog:post_detail', post_id=kwargs['post_id'])
         return super().dispatch(request, *args, **kwargs)
 
@@ -156,8 +344,7 @@ class DeletePostView(PostMixin, DeleteView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        instance = self.get_object()
-        context['form'] = CreatePostForm(instance=instance)
+        context['form'] = CreatePostForm(instance=self.object)
         return context
 
     def get_success_url(self):
@@ -165,16 +352,15 @@ class DeletePostView(PostMixin, DeleteView):
                        kwargs={'username': self.request.user.username})
 
 
-class CommentsMixin(LoginRequiredMixin):
+class CommentsMixin(CachedObjectMixin, LoginRequiredMixin):
     model = Comments
     form_class = CommentsForm
     template_name = "blog/comment.html"
     pk_url_kwarg = "comment_id"
 
     def dispatch(self, request, *args, **kwargs):
-        comment = get_object_or_404(
-            Comments, id=kwargs['comment_id'])
-        if comment.author != request.user:
+        comment = self.get_object()
+        if comment.author_id != request.user.pk:
             return redirect('blog:post_detail', post_id=kwargs['post_id'])
         else:
             return super().dispatch(request, *args, **kwargs)
@@ -185,8 +371,7 @@ class CommentsMixin(LoginRequiredMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["comment"] = get_object_or_404(
-            Comments, id=self.kwargs['comment_id'])
+        context["comment"] = self.object
         return context
 
 
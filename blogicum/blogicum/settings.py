@@ -38,11 +38,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "blog.middleware.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "blog.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "blog.middleware.ReplicaMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "blog.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -78,10 +81,40 @@ WSGI_APPLICATION = "blogicum.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# PRAGMAS применяются к каждому новому соединению (см. blogicum/sqlite3):
+# WAL не даёт читателям блокировать писателей, busy_timeout ждёт блокировку
+# вместо ошибки "database is locked".
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "blogicum.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "PRAGMAS": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -20000,
+            "temp_store": "MEMORY",
+        },
+    }
+}
+
+DATABASE_ROUTERS = ["blog.routers.ReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Кеш обязан быть общим для всех процессов: в нём версии карточек,
+# поколения страниц, сессии и записи о пользователях (проверка blog.E001).
+# Файлы подходят для нескольких процессов на одной машине; для нескольких
+# машин нужен Redis или Memcached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
     }
 }
 
@@ -124,6 +157,12 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
+# collectstatic собирает сюда файлы с хешем в имени, манифест и сжатые
+# копии; отдаёт их blog.middleware.StaticFilesMiddleware.
+STATIC_ROOT = BASE_DIR / "static"
+
+STATICFILES_STORAGE = "blog.staticfiles.CompressedManifestStaticFilesStorage"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -138,3 +177,82 @@ EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 LOGIN_REDIRECT_URL = 'blog:index'
 
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Blog feed
+# Граница видимости ленты округляется вниз до BLOG_FEED_BUCKET секунд (0 — без
+# округления). BLOG_CLOCK — путь к функции текущего времени для тестов.
+
+BLOG_FEED_BUCKET = 60
+
+BLOG_CLOCK = None
+
+# Ленты листаются курсорами ?after=/?before= вместо ?page=.
+BLOG_CURSOR_PAGINATION = False
+
+# Комментариев на странице поста; остальные подгружаются порциями.
+BLOG_COMMENTS_PER_PAGE = 50
+
+# Хранение сессий: 'db' — таблица django_session; 'cache_db' — чтение из
+# кеша, запись в базу только при изменении (кеш должен быть общим для всех
+# процессов); 'cookie' — подписанная cookie без хранения на сервере, но
+# данные видны клиенту, а выход не отзывает скопированную cookie.
+# Просроченные строки удаляет команда sweep_sessions. По умолчанию
+# 'cache_db', только если кеш общий (иначе выход из сессии не дошёл бы до
+# других процессов); проверка blog.E002 запрещает обратное.
+BLOG_SESSION_MODE = (
+    'db' if CACHES['default']['BACKEND'].endswith('.LocMemCache')
+    else 'cache_db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache_db': 'blog.sessions',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}[BLOG_SESSION_MODE]
+
+# Сколько секунд общий кеш хранит запись о вошедшем пользователе.
+BLOG_USER_CACHE_TIMEOUT = 300
+
+# Путь к файлу SQLite для отложенной записи комментариев (None — сразу в
+# основную базу). Очередь переносит команда flush_comments.
+BLOG_COMMENT_QUEUE = None
+
+# Сколько секунд хранить ленты для анонимных читателей (0 — не кешировать).
+BLOG_PAGE_CACHE_TIMEOUT = 300
+
+# Ширины уменьшенных копий фото публикаций (WebP и JPEG). Копии готовятся
+# в фоновых потоках; при BLOG_RENDITIONS_ASYNC = False — сразу после коммита.
+BLOG_IMAGE_WIDTHS = (320, 640, 960)
+
+BLOG_RENDITIONS_ASYNC = True
+
+BLOG_RENDITION_WORKERS = 2
+
+# Асинхронные ленты и страница поста из blog.async_views — для запуска
+# под ASGI (blogicum.asgi). Под WSGI выгоднее синхронные представления.
+BLOG_ASYNC_VIEWS = False
+
+# Псевдонимы реплик из DATABASES для чтения лент и страниц постов. После
+# изменяющего запроса клиент BLOG_REPLICA_STICKY_SECONDS читает из основной.
+BLOG_READ_REPLICAS = []
+
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+# Бюджет SQL-запросов на запрос к сайту по имени URL, с учётом сессии и
+# пользователя. Проверяется доля BLOG_QUERY_SAMPLE_RATE запросов; форма
+# запроса, повторённая BLOG_QUERY_REPEAT_THRESHOLD раз, считается N+1.
+BLOG_QUERY_BUDGETS = {
+    'blog:index': 5,
+    'blog:category_posts': 6,
+    'blog:profile': 6,
+    'blog:post_detail': 4,
+    'blog:post_comments': 4,
+    'blog:search': 5,
+}
+
+BLOG_QUERY_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+
+BLOG_QUERY_REPEAT_THRESHOLD = 3
+
+# Бросать QueryBudgetExceeded вместо записи в лог (для тестов).
+BLOG_QUERY_BUDGET_RAISE = False
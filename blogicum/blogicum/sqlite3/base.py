@@ -0,0 +1,24 @@
+"""SQLite с настраиваемыми PRAGMA для каждого нового соединения.
+
+PRAGMA задаются ключом PRAGMAS в DATABASES, например::
+
+    'PRAGMAS': {'journal_mode': 'WAL', 'busy_timeout': 5000}
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+ALLOWED_PRAGMAS = {
+    'journal_mode', 'synchronous', 'mmap_size', 'cache_size',
+    'busy_timeout', 'temp_store', 'wal_autocheckpoint',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            if name not in ALLOWED_PRAGMAS:
+                raise ImproperlyConfigured(f'Неизвестная PRAGMA: {name}')
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
@@ -41,6 +41,25 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def run_renditions_inline():
+    with override_settings(BLOG_RENDITIONS_ASYNC=False):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path):
+    # Откат транзакции теста не шлёт сигналов, поэтому у каждого теста
+    # свой пустой кеш — в его временном каталоге, а не в blogicum/cache
+    # локального сайта.
+    with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache')}}):
+        yield
+    from blog.auth import clear_local
+    clear_local()
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -363,6 +382,7 @@ def cleanup(request):
                     filename.endswith(".jpg")
                     or filename.endswith(".gif")
                     or filename.endswith(".png")
+                    or filename.endswith(".webp")
             ):
                 file_path = os.path.join(root, filename)
                 if os.path.getmtime(file_path) >= start_time:
@@ -0,0 +1,70 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from blog import api
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def api_posts(mixer, user, published_category):
+    posts = mixer.cycle(api.PAGE_SIZE + 5).blend(
+        'blog.Post', author=user, category=published_category,
+        is_published=True, location=None)
+    hidden = mixer.blend('blog.Post', author=user,
+                         category=published_category, is_published=False)
+    return posts, hidden
+
+
+def test_post_list_walks_cursor_and_hides_unpublished(client, api_posts):
+    posts, hidden = api_posts
+    seen, params = [], {}
+    while True:
+        data = client.get('/api/posts/', params).json()
+        seen.extend(item['id'] for item in data['results'])
+        if data['next'] is None:
+            break
+        params = {'after': data['next']}
+    assert sorted(seen) == sorted(post.pk for post in posts)
+    assert client.get(f'/api/posts/{hidden.pk}/').status_code == 404
+    detail = client.get(f'/api/posts/{posts[0].pk}/').json()
+    assert detail['author'] == posts[0].author.username
+
+
+def test_comment_list_pages_by_id(client, user, api_posts, monkeypatch):
+    monkeypatch.setattr(api, 'COMMENTS_PAGE_SIZE', 2)
+    post = api_posts[0][0]
+    comments = [post.comments.create(text=f'Комментарий {i}', author=user)
+                for i in range(3)]
+    first = client.get(f'/api/posts/{post.pk}/comments/').json()
+    assert [item['id'] for item in first['results']] == [
+        comment.pk for comment in comments[:2]]
+    rest = client.get(f'/api/posts/{post.pk}/comments/',
+                      {'after': first['next']}).json()
+    assert [item['id'] for item in rest['results']] == [comments[2].pk]
+    assert rest['next'] is None
+
+
+def test_export_streams_ndjson(client, api_posts):
+    posts, _ = api_posts
+    response = client.get('/api/posts/export.ndjson')
+    assert response.streaming
+    assert response['Content-Type'].startswith('application/x-ndjson')
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == sorted(
+        post.pk for post in posts)
+
+    out = StringIO()
+    call_command('export_posts', '--chunk-size', '7', stdout=out)
+    assert out.getvalue().splitlines() == lines
+
+
+def test_categories_list_only_published(
+        client, published_category, mixer):
+    mixer.blend('blog.Category', is_published=False)
+    data = client.get('/api/categories/').json()
+    assert [item['slug'] for item in data['results']] == [
+        published_category.slug]
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+
+from blog import async_views
+from blog.models import Post
+from blog.querybudget import QueryRecorder
+from conftest import N_PER_PAGE
+
+# Асинхронные представления ходят в базу из пула потоков, поэтому данные
+# теста должны быть закоммичены.
+pytestmark = [pytest.mark.django_db(transaction=True)]
+
+
+def call(view, user=None, query=None, **kwargs):
+    request = RequestFactory().get('/', query or {})
+    request.user = user or AnonymousUser()
+    request.session = {}
+    return async_to_sync(view)(request, **kwargs)
+
+
+@pytest.fixture
+def posts(mixer, user, published_category):
+    return mixer.cycle(N_PER_PAGE + 3).blend(
+        'blog.Post', author=user, category=published_category,
+        is_published=True, location=None)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+def test_async_feeds_match_sync_views(
+        client, user, published_category, posts):
+    pages = {
+        '/': (async_views.index, {}),
+        f'/category/{published_category.slug}/': (
+            async_views.category_posts,
+            {'category_slug': published_category.slug}),
+        f'/profile/{user.username}/': (
+            async_views.profile, {'username': user.username}),
+    }
+    for url, (view, kwargs) in pages.items():
+        for page in (1, 2):
+            expected = client.get(url, {'page': page}).content
+            response = call(view, query={'page': page}, **kwargs)
+            assert response.status_code == 200
+            assert response.content.replace(b'\n', b'') == (
+                expected.replace(b'\n', b'')), url
+    with pytest.raises(Http404):
+        call(async_views.index, query={'page': 5})
+
+
+def test_async_detail_hides_unpublished_from_others(
+        user, another_user, posts):
+    post = posts[0]
+    post.comments.create(text='Комментарий', author=another_user)
+    response = call(async_views.post_detail, post_id=post.pk)
+    assert 'Комментарий' in response.content.decode()
+
+    post.is_published = False
+    post.save()
+    with pytest.raises(Http404):
+        call(async_views.post_detail, another_user, post_id=post.pk)
+    assert call(async_views.post_detail, user,
+                post_id=post.pk).status_code == 200
+
+
+def test_async_queries_are_recorded(posts):
+    with QueryRecorder() as recorder:
+        call(async_views.index)
+    # COUNT и страница ленты выполнены в потоках пула.
+    assert len(recorder) >= 2
+
+
+def test_pool_threads_close_their_connections(posts, monkeypatch):
+    # Подключение к тестовой базе в памяти Django не закрывает, поэтому
+    # проверяется сам вызов close_old_connections в потоке пула.
+    closed = []
+    monkeypatch.setattr(async_views, 'close_old_connections',
+                        lambda: closed.append(threading.get_ident()))
+
+    def query():
+        return threading.get_ident(), Post.objects.count()
+
+    ident, count = async_to_sync(async_views.in_thread)(query)
+    assert count == len(posts)
+    assert closed == [ident, ident]
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.cache import bump_stamp
+
+User = get_user_model()
+
+pytestmark = [pytest.mark.django_db]
+
+
+def user_queries(client, url='/'):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    return response, [query['sql'] for query in queries.captured_queries
+                      if 'FROM "auth_user"' in query['sql']
+                      and '"auth_user"."id" =' in query['sql']]
+
+
+def test_logged_in_user_is_cached(user_client, user):
+    _, queries = user_queries(user_client)
+    assert len(queries) == 1
+    response, queries = user_queries(user_client)
+    assert queries == []
+    assert response.context['user'] == user
+    assert f'>{user.username}</a>' in response.content.decode()
+    # Поля вне записи дочитываются из базы по обращению.
+    assert response.context['user'].email == user.email
+
+
+def test_profile_edit_refreshes_cached_user(user_client, user):
+    user_queries(user_client)
+    response = user_client.post(f'/profile/{user.username}/edit/', {
+        'username': 'renamed', 'first_name': 'Имя', 'last_name': 'Фамилия',
+        'email': 'renamed@example.com'})
+    assert response.status_code == 302
+    response, _ = user_queries(user_client)
+    assert '>renamed</a>' in response.content.decode()
+
+
+def test_password_change_logs_out_other_sessions(user_client, user):
+    user_queries(user_client)
+    user.set_password('новый-пароль-123')
+    user.save()
+    response, queries = user_queries(user_client)
+    assert queries
+    assert not response.context['user'].is_authenticated
+
+
+def test_local_copy_follows_changes_from_other_processes(user_client, user):
+    user_queries(user_client)
+    # Другой процесс меняет версию в общем кеше, но не память этого.
+    bump_stamp('user', user.pk)
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    response, queries = user_queries(user_client)
+    assert queries
+    assert not response.context['user'].is_authenticated
@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import override_settings
+from django.utils import timezone
+
+from blog.cache import attach_card_versions
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_post_card_fragment_follows_related_edits(
+        client, post_with_published_location):
+    post = post_with_published_location
+    assert post.title in client.get('/').content.decode()
+
+    post.category.title = 'Новое название категории'
+    post.category.save()
+    assert 'Новое название категории' in client.get('/').content.decode()
+
+    post.author.username = 'renamed_author'
+    post.author.save()
+    assert '@renamed_author' in client.get('/').content.decode()
+
+    post.comments.create(text='Текст', author=post.author)
+    assert 'Комментарии (1)' in client.get('/').content.decode()
+
+
+def test_post_card_rendered_from_cache(
+        client, post_with_published_location):
+    post = post_with_published_location
+    client.get('/')
+    attach_card_versions([post])
+    key = make_template_fragment_key(
+        'post_card', [post.id, post.card_version])
+    assert post.title in cache.get(key)
+
+    post.title = 'Новый заголовок'
+    post.save()
+    attach_card_versions([post])
+    assert make_template_fragment_key(
+        'post_card', [post.id, post.card_version]) != key
+
+
+def test_anonymous_feed_served_from_page_cache(
+        client, post_with_published_location, django_assert_num_queries):
+    post = post_with_published_location
+    urls = ('/', f'/category/{post.category.slug}/',
+            f'/profile/{post.author.username}/')
+    for url in urls:
+        client.get(url)
+    for url in urls:
+        with django_assert_num_queries(0):
+            assert post.title in client.get(url).content.decode()
+
+    post.is_published = False
+    post.save()
+    for url in urls[:2]:
+        assert post.title not in client.get(url).content.decode()
+
+
+def test_page_cache_honours_scheduled_posts(
+        mixer, client, user, published_category):
+    now = timezone.now()
+    post = mixer.blend('blog.Post', author=user, category=published_category,
+                       pub_date=now + timedelta(hours=1))
+    with override_settings(BLOG_CLOCK=lambda: now):
+        assert post.title not in client.get('/').content.decode()
+    later = now + timedelta(hours=2)
+    with override_settings(BLOG_CLOCK=lambda: later):
+        assert post.title in client.get('/').content.decode()
+
+
+def test_conditional_get_answers_not_modified(
+        client, user_client, post_with_published_location,
+        django_assert_max_num_queries):
+    post = post_with_published_location
+    for url in ('/', f'/posts/{post.id}/'):
+        response = client.get(url)
+        etag = response['ETag']
+        with django_assert_max_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert user_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    detail = client.get(f'/posts/{post.id}/')
+    post.comments.create(text='Новый комментарий', author=post.author)
+    response = client.get(f'/posts/{post.id}/',
+                          HTTP_IF_NONE_MATCH=detail['ETag'])
+    assert response.status_code == 200
+    assert 'Новый комментарий' in response.content.decode()
+
+
+def test_if_modified_since_does_not_hide_related_edits(
+        client, user_client, post_with_published_location):
+    post = post_with_published_location
+    url = f'/posts/{post.id}/'
+    response = client.get(url)
+    assert not response.has_header('Last-Modified')
+    since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+    # Вошедший читатель видит страницу со своими формами.
+    assert user_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=since).status_code == 200
+
+    post.category.title = 'Новое название категории'
+    post.category.save()
+    response = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+    assert response.status_code == 200
+    assert 'Новое название категории' in response.content.decode()
+
+
+def test_relogin_invalidates_etag_of_pages_with_forms(
+        user, post_with_published_location):
+    from django.test import Client
+
+    client = Client(enforce_csrf_checks=True)
+    url = f'/posts/{post_with_published_location.id}/'
+    client.force_login(user)
+    client.get(url)  # первый ответ ставит cookie с CSRF-токеном
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    client.logout()
+    client.force_login(user)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
@@ -0,0 +1,27 @@
+from django.test import override_settings
+
+from blog.checks import check_session_cache, check_shared_cache
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def test_process_local_cache_is_rejected_in_production():
+    assert check_shared_cache(None) == []
+    with override_settings(CACHES=LOCMEM, DEBUG=False):
+        assert [error.id for error in check_shared_cache(None)] == [
+            'blog.E001']
+    with override_settings(CACHES=LOCMEM, DEBUG=True):
+        assert check_shared_cache(None) == []
+
+
+def test_cached_sessions_need_shared_cache():
+    assert check_session_cache(None) == []
+    with override_settings(CACHES=LOCMEM, DEBUG=True,
+                           SESSION_ENGINE='blog.sessions'):
+        assert [error.id for error in check_session_cache(None)] == [
+            'blog.E002']
+    with override_settings(
+            CACHES=LOCMEM,
+            SESSION_ENGINE='django.contrib.sessions.backends.db'):
+        assert check_session_cache(None) == []
@@ -0,0 +1,62 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from blog.cache import get_stamps
+from blog.models import Comments, FeedEntry, Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_comment_count_follows_add_and_delete(
+        user_client, post_with_published_location):
+    post = post_with_published_location
+    user_client.post(f'/posts/{post.id}/comment/', data={'text': 'Первый'})
+    user_client.post(f'/posts/{post.id}/comment/', data={'text': 'Второй'})
+    post.refresh_from_db()
+    assert post.comment_count == 2
+
+    comment = post.comments.first()
+    user_client.post(f'/posts/{post.id}/delete_comment/{comment.id}/')
+    post.refresh_from_db()
+    assert post.comment_count == 1
+
+
+def test_recount_comments_repairs_drift(mixer, user, published_category):
+    post = mixer.blend('blog.Post', author=user, category=published_category)
+    mixer.cycle(3).blend('blog.Comments', post=post, author=user)
+    Post.objects.filter(pk=post.pk).update(comment_count=42)
+    FeedEntry.objects.filter(pk=post.pk).update(comment_count=42)
+    assert Post.objects.with_comment_drift().count() == 1
+    stamp = get_stamps([('post', post.pk)])
+
+    call_command('recount_comments', stdout=StringIO())
+
+    post.refresh_from_db()
+    assert post.comment_count == 3
+    assert FeedEntry.objects.get(pk=post.pk).comment_count == 3
+    assert get_stamps([('post', post.pk)]) != stamp
+    assert not Post.objects.with_comment_drift().exists()
+
+
+def test_post_save_keeps_counter_updated_meanwhile(
+        user, post_with_published_location):
+    post = Post.objects.get(pk=post_with_published_location.pk)
+    post.comments.create(text='Текст', author=user)
+    post.title = 'Новый заголовок'
+    post.save()
+
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert FeedEntry.objects.get(pk=post.pk).comment_count == 1
+
+
+def test_post_delete_skips_per_comment_updates(
+        mixer, user, post_with_published_location,
+        django_assert_max_num_queries):
+    post = post_with_published_location
+    mixer.cycle(50).blend('blog.Comments', post=post, author=user)
+    with django_assert_max_num_queries(20):
+        post.delete()
+    assert not Comments.objects.exists()
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from blog.models import Comments
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def thread(mixer, user, published_category, settings):
+    settings.BLOG_COMMENTS_PER_PAGE = 2
+    post = mixer.blend('blog.Post', author=user, category=published_category,
+                       is_published=True, location=None,
+                       pub_date=timezone.now() - timedelta(days=1))
+    comments = [post.comments.create(text=f'Комментарий {i}', author=user)
+                for i in range(5)]
+    # Одинаковое время у соседей: порядок держится на id.
+    Comments.objects.filter(pk__in=[c.pk for c in comments[1:4]]).update(
+        created_at=comments[1].created_at)
+    return post, comments
+
+
+def test_detail_shows_first_page(client, thread):
+    post, comments = thread
+    response = client.get(f'/posts/{post.pk}/')
+    assert [c.pk for c in response.context['comments']] == [
+        c.pk for c in comments[:2]]
+    content = response.content.decode()
+    assert 'Комментарий 1' in content and 'Комментарий 2' not in content
+    assert f'/posts/{post.pk}/comments/?after=' in content
+    title = content.split('<title>')[1].split('</title>')[0]
+    assert '<script' not in title and content.count('<script>') == 1
+
+
+def test_fragments_walk_whole_thread(client, thread):
+    post, comments = thread
+    page = client.get(f'/posts/{post.pk}/').context['comments']
+    seen = [c.pk for c in page]
+    while page.has_next():
+        cursor = page.next_cursor
+        response = client.get(f'/posts/{post.pk}/comments/',
+                              {'after': cursor})
+        assert response.status_code == 200
+        assert '<html' not in response.content.decode()
+        page = response.context['comments']
+        seen.extend(c.pk for c in page)
+    assert seen == [c.pk for c in comments]
+
+    rest = client.get(f'/posts/{post.pk}/',
+                      {'comments_after': cursor})
+    assert [c.pk for c in rest.context['comments']] == [comments[4].pk]
+
+
+def test_fragment_respects_visibility(client, user_client, thread):
+    post, _ = thread
+    post.is_published = False
+    post.save()
+    assert client.get(f'/posts/{post.pk}/comments/').status_code == 404
+    assert user_client.get(f'/posts/{post.pk}/comments/').status_code == 200
+    assert client.get(f'/posts/{post.pk}/comments/',
+                      {'after': 'мусор'}).status_code == 404
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from blog.comment_queue import get_queue
+from blog.models import Comments, FeedEntry
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def queue(settings, tmp_path):
+    settings.BLOG_COMMENT_QUEUE = str(tmp_path / 'comments.sqlite3')
+    return get_queue()
+
+
+@pytest.fixture
+def post(mixer, user, published_category):
+    return mixer.blend('blog.Post', author=user, category=published_category,
+                       is_published=True, location=None,
+                       pub_date=timezone.now() - timedelta(days=1))
+
+
+def test_add_comment_goes_through_queue(user_client, user, post, queue):
+    response = user_client.post(f'/posts/{post.pk}/comment/',
+                                {'text': 'В очередь'})
+    assert response.status_code == 302
+    assert not Comments.objects.exists()
+    assert len(queue) == 1
+
+    out = StringIO()
+    call_command('flush_comments', '--once', stdout=out)
+    assert 'Перенесено комментариев: 1' in out.getvalue()
+    comment = Comments.objects.get()
+    assert (comment.post, comment.author, comment.text) == (
+        post, user, 'В очередь')
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert FeedEntry.objects.get(post=post).comment_count == 1
+    assert len(queue) == 0
+
+
+def test_flush_is_idempotent_and_skips_deleted(mixer, user, post, queue):
+    created_at = timezone.now() - timedelta(minutes=5)
+    queue.append(post.pk, user.pk, 'Один раз', created_at)
+    assert queue.flush() == 1
+    # Процесс упал после коммита, но до удаления записи из очереди.
+    queue.append(post.pk, user.pk, 'Один раз', created_at)
+    gone = mixer.blend('blog.Post', author=user)
+    queue.append(gone.pk, user.pk, 'К удалённому посту')
+    gone.delete()
+    assert queue.flush_all() == 2
+
+    comment = Comments.objects.get()
+    assert comment.created_at == created_at
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert len(queue) == 0
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+
+from blog.models import FeedEntry, Post
+from blog.utils import feed_cutoff, visible_since
+
+pytestmark = [pytest.mark.django_db]
+
+NOW = datetime(2023, 12, 1, 12, 0, 30, tzinfo=timezone.utc)
+
+
+def test_feed_cutoff_rounds_down_to_bucket():
+    with override_settings(BLOG_FEED_BUCKET=60):
+        # Отложенный пост не должен стать виден раньше своей даты.
+        assert feed_cutoff(NOW) == NOW.replace(second=0)
+        assert feed_cutoff(NOW.replace(second=0)) == NOW.replace(second=0)
+        assert visible_since(NOW) == NOW.replace(minute=1, second=0)
+    with override_settings(BLOG_FEED_BUCKET=0):
+        assert feed_cutoff(NOW) == NOW
+
+
+def test_scheduled_post_appears_without_restart(
+        mixer, user, published_category, client):
+    post = mixer.blend(
+        'blog.Post', author=user, category=published_category,
+        pub_date=NOW + timedelta(minutes=5))
+
+    with override_settings(BLOG_CLOCK=lambda: NOW):
+        assert not Post.objects.published().filter(pk=post.pk).exists()
+        response = client.get('/')
+        assert post not in response.context['page_obj']
+
+    later = NOW + timedelta(minutes=10)
+    with override_settings(BLOG_CLOCK=lambda: later):
+        assert Post.objects.published().filter(pk=post.pk).exists()
+        response = client.get('/')
+        assert post in response.context['page_obj']
+
+
+@override_settings(BLOG_CURSOR_PAGINATION=True)
+def test_cursor_pagination_walks_feed(
+        mixer, user, published_category, client):
+    mixer.cycle(25).blend(
+        'blog.Post', author=user, category=published_category,
+        pub_date=mixer.sequence(
+            *(NOW - timedelta(hours=i) for i in range(25))))
+    expected = list(Post.objects.published().order_by('-pub_date', '-pk'))
+
+    seen, url = [], '/'
+    while True:
+        page = client.get(url).context['page_obj']
+        seen.extend(page)
+        if not page.has_next():
+            break
+        url = f'/?after={page.next_cursor}'
+    assert seen == expected
+
+    previous = client.get(f'/?before={page.previous_cursor}')
+    assert list(previous.context['page_obj']) == expected[10:20]
+    assert client.get('/?after=garbage').status_code == 404
+
+
+def test_feed_entries_follow_source_rows(
+        mixer, user, published_category, published_locations):
+    post = mixer.blend(
+        'blog.Post', author=user, category=published_category,
+        location=published_locations[0], is_published=True)
+    entry = FeedEntry.objects.get(pk=post.pk)
+    assert entry.category_slug == published_category.slug
+
+    post.comments.create(text='Текст', author=user)
+    user.username = 'renamed'
+    user.save()
+    published_locations[0].name = 'Новое место'
+    published_locations[0].save()
+    entry.refresh_from_db()
+    assert (entry.comment_count, entry.author_username,
+            entry.location_name) == (1, 'renamed', 'Новое место')
+
+    published_category.is_published = False
+    published_category.save()
+    assert not FeedEntry.objects.filter(pk=post.pk).exists()
+    published_category.is_published = True
+    published_category.save()
+    assert FeedEntry.objects.filter(pk=post.pk).exists()
+
+    post.is_published = False
+    post.save()
+    assert not FeedEntry.objects.filter(pk=post.pk).exists()
+
+
+def test_category_edit_updates_feed_without_rebuild(
+        mixer, user, published_category, monkeypatch):
+    post = mixer.blend('blog.Post', author=user, category=published_category,
+                       is_published=True)
+    rebuilt = []
+    monkeypatch.setattr('blog.feed.rebuild', rebuilt.append)
+    published_category.title = 'Новый заголовок'
+    published_category.save()
+    assert not rebuilt
+    assert FeedEntry.objects.get(
+        pk=post.pk).category_title == 'Новый заголовок'
+
+
+def test_rebuild_feed_matches_published_posts(
+        mixer, user, published_category):
+    mixer.cycle(5).blend(
+        'blog.Post', author=user, category=published_category,
+        is_published=True)
+    FeedEntry.objects.all().delete()
+    call_command('rebuild_feed', stdout=StringIO())
+    assert set(FeedEntry.objects.values_list('pk', flat=True)) == set(
+        Post.objects.values_list('pk', flat=True))
@@ -0,0 +1,71 @@
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+from blog.querybudget import (QueryBudgetExceeded, normalize_sql,
+                              query_budget)
+from conftest import N_PER_PAGE
+
+pytestmark = [pytest.mark.django_db]
+
+
+# Бюджеты берутся из BLOG_QUERY_BUDGETS; middleware падает при превышении
+# или при повторяющейся форме запроса. В бюджет входит и запрос за
+# ближайшей отложенной публикацией: каждое сохранение поста его сбрасывает.
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_QUERY_SAMPLE_RATE=1.0,
+                   BLOG_QUERY_BUDGET_RAISE=True)
+@pytest.mark.parametrize('n_posts', [1, N_PER_PAGE + 5])
+def test_feed_query_budget(
+        mixer, user, published_category, published_locations, client,
+        user_client, n_posts):
+    posts = mixer.cycle(n_posts).blend(
+        'blog.Post', author=user, category=published_category,
+        location=mixer.sequence(*published_locations))
+    mixer.cycle(3).blend('blog.Comments', post=posts[0], author=user)
+
+    for url in ('/', f'/category/{published_category.slug}/',
+                f'/profile/{user.username}/', f'/posts/{posts[0].id}/',
+                '/search/?q=post'):
+        for reader in (client, user_client):
+            assert reader.get(url).status_code == 200
+
+
+def test_query_budget_flags_repeated_shapes(mixer, user, published_category):
+    mixer.cycle(3).blend('blog.Post', author=user,
+                         category=published_category)
+    with query_budget(budget=1) as recorder:
+        Post.objects.count()
+    assert len(recorder) == 1
+
+    with pytest.raises(QueryBudgetExceeded, match='N\\+1'):
+        with query_budget():
+            for post in Post.objects.all():
+                post.category.title
+    assert normalize_sql(
+        'SELECT 1 FROM t WHERE id IN (%s, %s) LIMIT 21'
+    ) == normalize_sql('SELECT 2 FROM t WHERE id IN (%s,%s,%s) LIMIT 1')
+
+
+def test_detail_query_budget(
+        post_with_published_location, client,
+        django_assert_max_num_queries):
+    post = post_with_published_location
+    with django_assert_max_num_queries(2):
+        assert client.get(f'/posts/{post.id}/').status_code == 200
+
+
+def test_edit_views_fetch_object_once(
+        user, user_client, post_with_published_location):
+    post = post_with_published_location
+    comment = post.comments.create(text='Текст', author=user)
+    for url, table in ((f'/posts/{post.id}/delete/', 'blog_post'),
+                       (f'/posts/{post.id}/edit_comment/{comment.id}/',
+                        'blog_comments')):
+        with CaptureQueriesContext(connection) as ctx:
+            assert user_client.get(url).status_code == 200
+        fetches = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('SELECT')
+                   and f'FROM "{table}"' in q['sql']]
+        assert len(fetches) == 1, url
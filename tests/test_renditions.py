@@ -0,0 +1,49 @@
+import pytest
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from blog.renditions import FAILED, delete_renditions, generate_renditions
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def post_with_renditions(post_with_published_location, settings):
+    settings.BLOG_IMAGE_WIDTHS = (32, 64, 320)
+    post = post_with_published_location
+    generate_renditions(post)
+    yield post
+    delete_renditions(post.image.storage, post.image_renditions)
+
+
+def test_renditions_are_resized_and_recorded(post_with_renditions):
+    post = post_with_renditions
+    post.refresh_from_db()
+    assert set(post.image_renditions) == {'webp', 'jpeg'}
+    # Копии не шире оригинала (100 px).
+    assert set(post.image_renditions['webp']) == {'32', '64', '100'}
+    name = post.image_renditions['webp']['32']
+    with post.image.storage.open(name) as image_file:
+        with Image.open(image_file) as image:
+            assert image.format == 'WEBP'
+            assert image.width == 32
+
+
+def test_feed_card_has_srcset(client, post_with_renditions):
+    content = client.get('/').content.decode()
+    assert 'type="image/webp"' in content
+    assert post_with_renditions.image_renditions['jpeg']['64'] in content
+
+
+def test_broken_image_is_not_requeued(
+        client, post_with_published_location, monkeypatch):
+    post = post_with_published_location
+    post.image.save('broken.jpg', ContentFile(b'not an image'))
+    assert generate_renditions(post) == {FAILED: True}
+
+    queued = []
+    monkeypatch.setattr('blog.templatetags.blog_images.schedule_renditions',
+                        queued.append)
+    assert client.get('/').status_code == 200
+    assert not queued
+    post.image.delete()
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from blog.cache import attach_card_versions
+from blog.middleware import PRIMARY_COOKIE
+from blog.models import Post
+from blog.routers import ReplicaRouter, read_alias
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def seen_aliases(monkeypatch):
+    aliases = []
+    route = ReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        alias = route(self, model, **hints)
+        if model is Post:
+            aliases.append(alias)
+        # Реплики в тестах нет — сами запросы идут в основную базу.
+        return None
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', spy)
+    return aliases
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'], BLOG_PAGE_CACHE_TIMEOUT=0)
+def test_read_views_use_replica_until_write(
+        user_client, post_with_published_location, seen_aliases):
+    post = post_with_published_location
+    user_client.get('/')
+    user_client.get(f'/posts/{post.id}/')
+    assert set(seen_aliases) == {'replica'}
+    assert read_alias.get() is None
+
+    seen_aliases.clear()
+    response = user_client.post(f'/posts/{post.id}/comment/',
+                                data={'text': 'Текст'})
+    assert int(response.cookies[PRIMARY_COOKIE].value) > time.time()
+    user_client.get(f'/posts/{post.id}/')
+    assert set(seen_aliases) == {None}
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'])
+def test_write_views_stay_on_primary(
+        user_client, post_with_published_location, seen_aliases):
+    user_client.get(f'/posts/{post_with_published_location.id}/edit/')
+    assert set(seen_aliases) == {None}
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'])
+def test_replica_reads_neither_fill_caches_nor_send_etags(
+        user_client, post_with_published_location, seen_aliases):
+    post = post_with_published_location
+    response = user_client.get('/')
+    assert set(seen_aliases) == {'replica'}
+    assert post.title in response.content.decode()
+    assert not response.has_header('ETag')
+    attach_card_versions([post])
+    key = make_template_fragment_key('post_card', [post.id, post.card_version])
+    assert cache.get(key) is None
+
+    cache.set(key, 'Карточка из кеша')
+    response = user_client.get('/')
+    assert 'Карточка из кеша' in response.content.decode()
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'],
+                   BLOG_PAGE_CACHE_TIMEOUT=60)
+def test_anonymous_page_cache_fills_from_primary(
+        client, post_with_published_location, seen_aliases):
+    response = client.get('/')
+    assert set(seen_aliases) == {None}
+    assert response.has_header('ETag')
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/')
+    assert not queries
+    assert post_with_published_location.title in response.content.decode()
+    assert client.get(
+        '/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'])
+def test_export_stream_stays_on_replica(client, monkeypatch):
+    aliases = []
+    monkeypatch.setattr('blog.api.export_lines',
+                        lambda posts: aliases.append(posts.db) or iter(()))
+    response = client.get('/api/posts/export.ndjson')
+    list(response.streaming_content)
+    assert aliases == ['replica']
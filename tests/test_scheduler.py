@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.test import override_settings
+
+from blog.cache import scope_generation
+from blog.scheduler import PublicationScheduler, post_became_visible
+
+pytestmark = [pytest.mark.django_db]
+
+NOW = datetime(2023, 12, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def events():
+    received = []
+
+    def receiver(sender, post, **kwargs):
+        received.append(post.pk)
+
+    post_became_visible.connect(receiver)
+    yield received
+    post_became_visible.disconnect(receiver)
+
+
+@override_settings(BLOG_FEED_BUCKET=0)
+def test_scheduler_fires_in_pub_date_order(
+        mixer, user, published_category, events):
+    late, early = mixer.cycle(2).blend(
+        'blog.Post', author=user, category=published_category,
+        is_published=True, pub_date=mixer.sequence(
+            NOW + timedelta(minutes=10), NOW + timedelta(minutes=5)))
+    clock = Clock(NOW)
+    scheduler = PublicationScheduler(clock)
+    scheduler.refresh()
+    assert len(scheduler) == 2
+    assert scheduler.next_due() == early.pub_date
+    assert scheduler.run_pending() == []
+
+    clock.now = NOW + timedelta(minutes=6)
+    scheduler.refresh()
+    assert scheduler.run_pending() == [early]
+    clock.now = NOW + timedelta(minutes=11)
+    assert scheduler.run_pending() == [late]
+    assert events == [early.pk, late.pk]
+    assert scheduler.next_due() is None
+
+
+@override_settings(BLOG_FEED_BUCKET=0)
+def test_scheduler_skips_moved_and_unpublished_posts(
+        mixer, user, published_category, events):
+    moved, hidden = mixer.cycle(2).blend(
+        'blog.Post', author=user, category=published_category,
+        is_published=True, pub_date=NOW + timedelta(minutes=5))
+    clock = Clock(NOW)
+    scheduler = PublicationScheduler(clock)
+    scheduler.refresh()
+
+    moved.pub_date = NOW + timedelta(hours=1)
+    moved.save()
+    hidden.is_published = False
+    hidden.save()
+    clock.now = NOW + timedelta(minutes=6)
+    assert scheduler.run_pending() == []
+
+    scheduler.refresh()
+    assert scheduler.next_due() == moved.pub_date
+    assert events == []
+
+
+@override_settings(BLOG_FEED_BUCKET=0)
+def test_visible_event_invalidates_feed_pages(
+        mixer, user, published_category):
+    mixer.blend('blog.Post', author=user, category=published_category,
+                is_published=True, pub_date=NOW + timedelta(minutes=5))
+    clock = Clock(NOW)
+    scheduler = PublicationScheduler(clock)
+    scheduler.refresh()
+    scopes = [('feed', 'all'), ('category', published_category.slug),
+              ('author', user.username)]
+    with override_settings(BLOG_CLOCK=clock):
+        before = scope_generation(scopes).split('-')[1:]
+        clock.now = NOW + timedelta(minutes=6)
+        scheduler.run_pending()
+        after = scope_generation(scopes).split('-')[1:]
+    assert all(old != new for old, new in zip(before, after))
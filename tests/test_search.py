@@ -0,0 +1,46 @@
+import pytest
+
+from blog.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def searchable_posts(mixer, user, published_category):
+    def blend(title, text, **kwargs):
+        return mixer.blend('blog.Post', author=user,
+                           category=published_category,
+                           title=title, text=text, **kwargs)
+    return {
+        'title': blend('Путешествие на Байкал', 'Заметки о поездке'),
+        'text': blend('Заметки', 'Зимой Байкал покрыт льдом'),
+        'hidden': blend('Байкал летом', 'Черновик', is_published=False),
+        'other': blend('Горы Алтая', 'Ничего общего'),
+    }
+
+
+def test_search_ranks_and_respects_visibility(client, searchable_posts):
+    response = client.get('/search/', {'q': 'байкал'})
+    found = list(response.context['page_obj'])
+    assert found == [searchable_posts['title'], searchable_posts['text']]
+
+
+def test_search_index_follows_edits(searchable_posts):
+    post = searchable_posts['other']
+    post.title = 'Озеро Байкал с высоты'
+    post.save()
+    assert post in Post.objects.search('Байкал')
+    post.delete()
+    assert not Post.objects.search('Алтая').exists()
+
+
+def test_search_input_is_not_fts_syntax(client, searchable_posts):
+    for query in ('', ' ', '"', 'AND OR NOT', 'title:*', 'байк'):
+        assert client.get('/search/', {'q': query}).status_code == 200
+    assert searchable_posts['title'] in Post.objects.search('байк')
+
+
+def test_admin_search_uses_index(admin_client, searchable_posts):
+    response = admin_client.get('/admin/blog/post/', {'q': 'льдом'})
+    assert list(response.context['cl'].result_list) == [
+        searchable_posts['text']]
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.sessions import SessionStore, sweep_expired
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_unchanged_session_is_not_written():
+    store = SessionStore()
+    store['theme'] = 'dark'
+    store.save()
+
+    same = SessionStore(store.session_key)
+    same['theme'] = 'dark'
+    assert same.modified
+    with CaptureQueriesContext(connection) as queries:
+        same.save()
+    assert len(queries) == 0
+
+    same['theme'] = 'light'
+    same.save()
+    assert Session.objects.get(
+        session_key=store.session_key).get_decoded() == {'theme': 'light'}
+
+
+def test_authenticated_request_reads_session_from_cache(user_client):
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.get('/').status_code == 200
+    assert not any('django_session' in query['sql']
+                   for query in queries.captured_queries)
+
+
+def test_sweep_deletes_expired_in_batches():
+    now = timezone.now()
+    for i in range(5):
+        Session.objects.create(session_key=f'old{i}', session_data='',
+                               expire_date=now - timedelta(days=1))
+    Session.objects.create(session_key='live', session_data='',
+                           expire_date=now + timedelta(days=1))
+    assert sweep_expired(batch_size=2, pause=0) == 5
+    assert list(Session.objects.values_list('session_key', flat=True)) == [
+        'live']
@@ -0,0 +1,53 @@
+import gzip
+import re
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    settings.STATIC_ROOT = tmp_path
+    call_command('collectstatic', interactive=False, verbosity=0)
+    return tmp_path
+
+
+def read_body(response):
+    return b''.join(response.streaming_content)
+
+
+def test_pages_link_hashed_assets_served_immutable(collected):
+    client = Client()
+    page = client.get('/').content.decode()
+    css_url = re.search(
+        r'/static/css/bootstrap\.min\.[0-9a-f]{12}\.css', page).group()
+    original = (settings.BASE_DIR / 'static_dev' / 'css'
+                / 'bootstrap.min.css').read_bytes()
+
+    response = client.get(css_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['Content-Type'] == 'text/css'
+    assert 'immutable' in response['Cache-Control']
+    assert response['Vary'] == 'Accept-Encoding'
+    compressed = read_body(response)
+    assert len(compressed) < len(original)
+    assert gzip.decompress(compressed) == original
+
+    plain = client.get(css_url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+    assert not plain.has_header('Content-Encoding')
+    assert read_body(plain) == original
+
+    again = client.get(css_url, HTTP_IF_NONE_MATCH=plain['ETag'])
+    assert again.status_code == 304
+
+
+def test_unhashed_names_are_revalidated(collected):
+    response = Client().get('/static/img/logo.png')
+    assert response.status_code == 200
+    assert 'immutable' not in response['Cache-Control']
+    assert not response.has_header('Vary')